@@ -11,7 +11,6 @@ requirements = python3,\
     flet==0.19.0,\
     flet-core==0.19.0,\
     numpy==1.26.0,\
-    scipy==1.11.3,\
     pillow>=10.0.1,\
     requests
 
@@ -1,18 +1,24 @@
 import flet as ft
-import numpy as np
-from scipy import interpolate
 import sqlite3
 import os
+import threading
 from pathlib import Path
 from datetime import datetime
-import requests
-from functools import lru_cache
 import json
 import logging
-
-# Setup detailed logging
+from src.weight_calculator.database import (ConnectionManager, TableCache, WriteBehindQueue,
+                                            install_change_counter, migrate_in_chunks)
+from src.weight_calculator.interpolation import CalibrationModel, CalibrationLUT, points_signature
+from src.weight_calculator.exporter import export_history
+from src.weight_calculator.geolocation import GeoCache, get_location_fallback
+from src.weight_calculator.importer import import_history, import_points
+from src.weight_calculator.locations import (HISTORY_INSERT, LOCATION_JOIN, LOCATION_NAME, MIGRATE_LOCATIONS,
+                                              LocationCache, create_locations_table)
+from src.weight_calculator.retention import apply_retention, get_daily_summary, shrink_file
+
+# Setup detailed logging; WEIGHTCALC_LOG_LEVEL=WARNING keeps startup quiet on devices
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.environ.get("WEIGHTCALC_LOG_LEVEL", "DEBUG").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -41,8 +47,7 @@ TRANSLATIONS = {
         "point_error": "❌ Error adding point",
         "changes_saved": "✅ Changes saved",
         "changes_error": "❌ Error saving changes",
-        "unknown": "Unknown",
-        "page": "Page"
+        "unknown": "Unknown"
     },
     "es": {
         "app_title": "Calculadora de peso",
@@ -66,8 +71,7 @@ TRANSLATIONS = {
         "point_error": "❌ Error al añadir punto",
         "changes_saved": "✅ Cambios guardados",
         "changes_error": "❌ Error al guardar cambios",
-        "unknown": "Desconocido",
-        "page": "Página"
+        "unknown": "Desconocido"
     },
     "ru": {
         "app_title": "Калькулятор веса",
@@ -91,8 +95,7 @@ TRANSLATIONS = {
         "point_error": "❌ Ошибка добавления точки",
         "changes_saved": "✅ Изменения сохранены",
         "changes_error": "❌ Ошибка сохранения изменений",
-        "unknown": "Неизвестно",
-        "page": "Страница"
+        "unknown": "Неизвестно"
     },
     "uk": {
         "app_title": "Калькулятор ваги",
@@ -116,8 +119,7 @@ TRANSLATIONS = {
         "point_error": "❌ Помилка додавання точки",
         "changes_saved": "✅ Зміни збережено",
         "changes_error": "❌ Помилка збереження змін",
-        "unknown": "Невідомо",
-        "page": "Сторінка"
+        "unknown": "Невідомо"
     },
     "hi": {
         "app_title": "वजन कैलकुलेटर",
@@ -141,8 +143,7 @@ TRANSLATIONS = {
         "point_error": "❌ बिंदु जोड़ने में त्रुटि",
         "changes_saved": "✅ परिवर्तन सहेजे गए",
         "changes_error": "❌ परिवर्तन सहेजने में त्रुटि",
-        "unknown": "अज्ञात",
-        "page": "पृष्ठ"
+        "unknown": "अज्ञात"
     },
     "mo": {
         "app_title": "Calculator de greutate",
@@ -166,8 +167,7 @@ TRANSLATIONS = {
         "point_error": "❌ Eroare la adăugarea punctului",
         "changes_saved": "✅ Modificări salvate",
         "changes_error": "❌ Eroare la salvarea modificărilor",
-        "unknown": "Necunoscut",
-        "page": "Pagină"
+        "unknown": "Necunoscut"
     },
     "ky": {
         "app_title": "Салмак калькулятору",
@@ -191,8 +191,7 @@ TRANSLATIONS = {
         "point_error": "❌ Чекитти кошууда ката кетти",
         "changes_saved": "✅ Өзгөртүүлөр сакталды",
         "changes_error": "❌ Өзгөртүүлөрдү сактоодо ката кетти",
-        "unknown": "Белгисиз",
-        "page": "Бет"
+        "unknown": "Белгисиз"
     },
     "uz": {
         "app_title": "Vazn kalkulyatori",
@@ -216,46 +215,200 @@ TRANSLATIONS = {
         "point_error": "❌ Nuqta qo'shishda xato",
         "changes_saved": "✅ O'zgarishlar saqlandi",
         "changes_error": "❌ O'zgarishlarni saqlashda xato",
-        "unknown": "Noma'lum",
-        "page": "Sahifa"
+        "unknown": "Noma'lum"
     }
 }
 
 class WeightCalculator:
     def __init__(self, page: ft.Page):
         self.calibration_points = []
+        self.calibration_version = 0
+        self._model = None
+        self._model_version = -1
+        # "spline" keeps the fixed linear/quadratic spline, "auto" picks the curve by leave-one-out error
+        self.model_kind = os.environ.get("WEIGHTCALC_MODEL", "spline")
+        # "exact" evaluates the spline, "lut" answers from a precomputed table
+        self.evaluation_mode = os.environ.get("WEIGHTCALC_EVALUATION", "exact")
+        self._lut = None
+        self._lut_version = -1
         self.db_path = str(Path.home() / "calibration.db")
+        self.lut_path = str(Path.home() / "calibration_lut.json")
+        self.db = ConnectionManager.for_path(self.db_path)
+        self.locations = LocationCache.shared(self.db.path)
+        self.geo_cache = None
+        # "immediate" commits every calculation, "batched" groups them in a background writer
+        self.history_durability = os.environ.get("WEIGHTCALC_HISTORY_DURABILITY", "immediate")
+        self.history_queue = None
+        # Days of raw history to keep; older rows are rolled up into daily totals
+        retention_days = os.environ.get("WEIGHTCALC_HISTORY_RETENTION_DAYS")
+        self.retention_days = int(retention_days) if retention_days else None
         self.client_ip = get_client_ip(page)
-        self.current_location = get_location_fallback(self.client_ip)
-        self.current_page = 1
+        # Filled in by a background lookup; the session never waits on the network
+        self.current_location = None
+        self.location_resolved = False
+        self._location_lock = threading.Lock()
+        self._location_thread = None
+        self._location_callbacks = []
+        # History rows saved before the location was known
+        self._unlocated_ids = []
+        # Rows per history page fetched by keyset cursor
         self.items_per_page = 30
         self.current_language = "en"  # Default language
         self.init_db()
+        self.geo_cache = GeoCache.shared(self.db)
+        self.points_cache = TableCache.shared(
+            self.db, "calibration_points",
+            "SELECT id, pressure, weight FROM calibration_points ORDER BY pressure")
         self.load_points()
+        if self.history_durability == "batched":
+            self.history_queue = WriteBehindQueue.shared(self.db, HISTORY_INSERT)
+        self.start_timestamp_migration()
+        self.start_location_migration()
+        self.start_location_lookup()
+        if self.retention_days is not None:
+            self.start_maintenance("retention", lambda: apply_retention(self.db, self.retention_days))
 
     def init_db(self):
         """Initialize database with proper schema"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-
-            c.execute('''CREATE TABLE IF NOT EXISTS calibration_points
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         pressure REAL NOT NULL,
-                         weight REAL NOT NULL)''')
-
-            c.execute('''CREATE TABLE IF NOT EXISTS weight_history
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         date TEXT NOT NULL,
-                         pressure REAL NOT NULL,
-                         weight REAL NOT NULL,
-                         location TEXT)''')
-
-            conn.commit()
-            conn.close()
+            with self.db.writer() as conn:
+                c = conn.cursor()
+
+                c.execute('''CREATE TABLE IF NOT EXISTS calibration_points
+                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             pressure REAL NOT NULL,
+                             weight REAL NOT NULL)''')
+                install_change_counter(conn, 'calibration_points')
+
+                create_locations_table(conn)
+                self.create_history_table(c)
         except sqlite3.Error as e:
             print(f"Ошибка инициализации БД: {str(e)}")
 
+    def create_history_table(self, c):
+        """Create weight_history with its indexes, upgrading old tables"""
+        # ts is the UTC epoch second; date is only filled in rows written
+        # before ts existed and is emptied once they are migrated. Likewise
+        # location holds the name only in rows written before location_id.
+        c.execute('''CREATE TABLE IF NOT EXISTS weight_history
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     date TEXT NOT NULL DEFAULT '',
+                     pressure REAL NOT NULL,
+                     weight REAL NOT NULL,
+                     location TEXT,
+                     ts INTEGER NOT NULL DEFAULT 0,
+                     location_id INTEGER REFERENCES locations (id))''')
+        columns = [row[1] for row in c.execute("PRAGMA table_info(weight_history)")]
+        if 'ts' not in columns:
+            c.execute("ALTER TABLE weight_history ADD COLUMN ts INTEGER NOT NULL DEFAULT 0")
+        if 'location_id' not in columns:
+            c.execute("ALTER TABLE weight_history ADD COLUMN location_id INTEGER REFERENCES locations (id)")
+
+        # Key for newest-first keyset pagination; rows not migrated yet
+        # have ts = 0 and sort after all others
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_weight_history_ts_id
+                    ON weight_history (ts, id)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_weight_history_location_ts
+                    ON weight_history (location_id, ts)''')
+        # Only rows still waiting for the location migration; empty afterwards
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_weight_history_legacy_location
+                    ON weight_history (id) WHERE location IS NOT NULL''')
+
+    _maintenance = set()
+    _maintenance_lock = threading.Lock()
+
+    def start_maintenance(self, name, task):
+        """
+        Run a maintenance task in a background thread
+
+        A task already running for the same database is not started twice.
+        """
+        key = (self.db_path, name)
+        with WeightCalculator._maintenance_lock:
+            if key in WeightCalculator._maintenance:
+                return
+            WeightCalculator._maintenance.add(key)
+
+        def run():
+            try:
+                result = task()
+                logger.info(f"Maintenance {name} finished: {result}")
+            except sqlite3.Error as e:
+                print(f"Ошибка обслуживания БД ({name}): {str(e)}")
+            finally:
+                with WeightCalculator._maintenance_lock:
+                    WeightCalculator._maintenance.discard(key)
+
+        threading.Thread(target=run, name=f"history-{name}", daemon=True).start()
+
+    def start_timestamp_migration(self):
+        """Convert TEXT dates of old history rows to epoch seconds in the background"""
+        with self.db.reader() as conn:
+            if conn.execute("SELECT 1 FROM weight_history WHERE ts = 0 LIMIT 1").fetchone() is None:
+                return
+
+        # Newest rows first, so migrated and pending rows keep their order;
+        # unparseable dates are mapped to the epoch start
+        self.start_maintenance("migration", lambda: migrate_in_chunks(self.db, """
+            UPDATE weight_history
+            SET ts = COALESCE(CAST(strftime('%s', date, 'utc') AS INTEGER), 1), date = ''
+            WHERE id IN (SELECT id FROM weight_history WHERE ts = 0 ORDER BY id DESC LIMIT ?)"""))
+
+    def start_location_migration(self):
+        """Move location names of old history rows into the locations table in the background"""
+        with self.db.reader() as conn:
+            if conn.execute("SELECT 1 FROM weight_history WHERE location IS NOT NULL LIMIT 1").fetchone() is None:
+                return
+        self.start_maintenance("locations", lambda: migrate_in_chunks(self.db, MIGRATE_LOCATIONS))
+
+    def start_location_lookup(self, on_resolved=None):
+        """
+        Resolve the client location in a background thread
+
+        When the lookup finishes, current_location is set, rows saved in the
+        meantime get the location in one UPDATE, and on_resolved is called
+        with the location. While a lookup is already running, on_resolved
+        is called when that one finishes instead.
+        """
+        def lookup():
+            location = get_location_fallback(self.client_ip, self.geo_cache)
+            try:
+                self.locations.intern(self.db, location)
+            except sqlite3.Error as e:
+                print(f"Ошибка сохранения местоположения: {str(e)}")
+                # Later saves must not keep waiting for a location
+                location = None
+            with self._location_lock:
+                self.current_location = location
+                self.location_resolved = True
+                row_ids = self._unlocated_ids if location else []
+                self._unlocated_ids = []
+                callbacks = self._location_callbacks
+                self._location_callbacks = []
+                # Callbacks registered from now on need a lookup of their own
+                self._location_thread = None
+            try:
+                if row_ids:
+                    with self.db.writer() as conn:
+                        conn.executemany(
+                            """UPDATE weight_history
+                               SET location_id = (SELECT id FROM locations WHERE name = ?)
+                               WHERE id = ? AND location_id IS NULL""",
+                            [(location, row_id) for row_id in row_ids])
+                    logger.info(f"Location backfilled for {len(row_ids)} history rows")
+            except sqlite3.Error as e:
+                print(f"Ошибка сохранения местоположения: {str(e)}")
+            for callback in callbacks:
+                callback(location)
+
+        with self._location_lock:
+            if on_resolved is not None:
+                self._location_callbacks.append(on_resolved)
+            if self._location_thread is not None and self._location_thread.is_alive():
+                return
+            self._location_thread = threading.Thread(target=lookup, name="location-lookup", daemon=True)
+            self._location_thread.start()
+
     def validate_values(self, pressure, weight):
         """Validate input values"""
         try:
@@ -268,13 +421,12 @@ class WeightCalculator:
             return False
 
     def load_points(self):
-        """Load calibration points from database"""
+        """Load calibration points, served from the shared cache unless the table changed"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("SELECT id, pressure, weight FROM calibration_points ORDER BY pressure")
-            self.calibration_points = c.fetchall()
-            conn.close()
+            points = self.points_cache.get()
+            if points is not self.calibration_points:
+                self.calibration_points = points
+                self.calibration_version += 1
             return self.calibration_points
         except sqlite3.Error as e:
             print(f"Ошибка загрузки точек: {str(e)}")
@@ -286,12 +438,10 @@ class WeightCalculator:
             if not self.validate_values(pressure, weight):
                 return False
 
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("INSERT INTO calibration_points (pressure, weight) VALUES (?, ?)",
-                     (pressure, weight))
-            conn.commit()
-            conn.close()
+            with self.db.writer() as conn:
+                c = conn.cursor()
+                c.execute("INSERT INTO calibration_points (pressure, weight) VALUES (?, ?)",
+                         (pressure, weight))
             return self.load_points()
         except sqlite3.Error as e:
             print(f"Ошибка добавления точки: {str(e)}")
@@ -303,101 +453,325 @@ class WeightCalculator:
             if not self.validate_values(pressure, weight):
                 return False
 
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("UPDATE calibration_points SET pressure = ?, weight = ? WHERE id = ?",
-                     (pressure, weight, point_id))
-            conn.commit()
-            conn.close()
+            with self.db.writer() as conn:
+                c = conn.cursor()
+                c.execute("UPDATE calibration_points SET pressure = ?, weight = ? WHERE id = ?",
+                         (pressure, weight, point_id))
+            return self.load_points()
+        except sqlite3.Error as e:
+            print(f"Ошибка редактирования точки: {str(e)}")
+            return False
+
+    def apply_point_changes(self, edits=None, inserts=(), deletes=()):
+        """
+        Apply many calibration edits, inserts and deletes in one transaction
+
+        Args:
+            edits: mapping of point id to {'pressure': ..., 'weight': ...}
+            inserts: iterable of (pressure, weight) for new points
+            deletes: iterable of point ids to remove
+
+        Returns:
+            Reloaded points, or False if any value is invalid or the
+            transaction failed, in which case nothing is changed
+        """
+        updates = [(values['pressure'], values['weight'], point_id)
+                   for point_id, values in (edits or {}).items()]
+        inserts = list(inserts)
+        deletes = [(point_id,) for point_id in deletes]
+        if not all(self.validate_values(pressure, weight) for pressure, weight, _ in updates) or \
+                not all(self.validate_values(pressure, weight) for pressure, weight in inserts):
+            return False
+
+        try:
+            with self.db.writer() as conn:
+                c = conn.cursor()
+                c.executemany("UPDATE calibration_points SET pressure = ?, weight = ? WHERE id = ?", updates)
+                c.executemany("INSERT INTO calibration_points (pressure, weight) VALUES (?, ?)", inserts)
+                c.executemany("DELETE FROM calibration_points WHERE id = ?", deletes)
             return self.load_points()
         except sqlite3.Error as e:
             print(f"Ошибка редактирования точки: {str(e)}")
             return False
 
+    def import_csv(self, kind, source, progress=None):
+        """
+        Stream calibration points or history rows from a CSV file
+
+        Args:
+            kind: 'points' or 'history'
+            source: path or text stream of the CSV file
+            progress: optional callback(report, fraction) called after every chunk
+
+        Returns:
+            ImportReport, or None if the import failed
+        """
+        importer = import_points if kind == 'points' else import_history
+        try:
+            if kind != 'points' and self.history_queue is not None:
+                self.history_queue.flush()
+            report = importer(self.db, source, progress=progress)
+            self.load_points()
+            return report
+        except (sqlite3.Error, OSError) as e:
+            print(f"Ошибка импорта: {str(e)}")
+            return None
+
     def delete_point(self, point_id):
         """Delete calibration point"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("DELETE FROM calibration_points WHERE id = ?", (point_id,))
-            conn.commit()
-            conn.close()
-            self.calibration_points = self.load_points()
+            with self.db.writer() as conn:
+                c = conn.cursor()
+                c.execute("DELETE FROM calibration_points WHERE id = ?", (point_id,))
+            self.load_points()
             return True
         except sqlite3.Error as e:
             print(f"Ошибка удаления точки: {str(e)}")
             return False
 
+    def get_model(self):
+        """Get calibration model compiled for the current set of points"""
+        if len(self.calibration_points) < 2:
+            return None
+
+        if self._model_version != self.calibration_version:
+            points = [(p[1], p[2]) for p in self.calibration_points]
+            if self.model_kind == "auto" and len(points) >= 3:
+                # Imported here: model selection needs NumPy, plain evaluation does not
+                from src.weight_calculator.model_selection import select_model
+
+                selection = select_model(points)
+                logger.info(f"Selected calibration model {selection.kind}: {selection.scores}")
+                self._model = selection.model
+            else:
+                self._model = CalibrationModel(points)
+            self._model_version = self.calibration_version
+        return self._model
+
+    def get_lut(self):
+        """Get lookup table for the current set of points, regenerated only when they change"""
+        model = self.get_model()
+        if model is None:
+            return None
+
+        if self._lut_version != self.calibration_version:
+            # The configured and the fitted kind both matter: "auto" may pick another model
+            signature = points_signature([(p[1], p[2]) for p in self.calibration_points],
+                                         f"{self.model_kind}:{model.kind}")
+            lut = None
+            try:
+                with open(self.lut_path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("signature") == signature:
+                    lut = CalibrationLUT.from_dict(data, model=model)
+            except (OSError, ValueError, KeyError):
+                pass
+
+            if lut is None:
+                lut = CalibrationLUT.build(model, signature=signature)
+                logger.info(f"Calibration table rebuilt, max error {lut.max_error:.3g}")
+                # Written to a file of this thread and swapped in, so sessions saving
+                # at the same time never leave a mix of two tables behind
+                temp_path = f"{self.lut_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    with open(temp_path, "w", encoding="utf-8") as f:
+                        json.dump(lut.to_dict(), f)
+                    os.replace(temp_path, self.lut_path)
+                except OSError as e:
+                    print(f"Ошибка сохранения таблицы калибровки: {str(e)}")
+                    try:
+                        os.remove(temp_path)
+                    except OSError:
+                        pass
+
+            self._lut = lut
+            self._lut_version = self.calibration_version
+        return self._lut
+
+    def get_evaluator(self):
+        """Get the calibration evaluator for the configured evaluation mode"""
+        if self.evaluation_mode == "lut":
+            return self.get_lut()
+        return self.get_model()
+
     def calculate_weight(self, pressure):
         """Calculate weight using interpolation"""
+        # Picks up points changed by other sessions; a cache hit is one PRAGMA
+        self.load_points()
         if len(self.calibration_points) < 2:
             return None
 
         try:
-            pressures = np.array([p[1] for p in self.calibration_points])
-            weights = np.array([p[2] for p in self.calibration_points])
+            return self.get_evaluator()(pressure)
+        except Exception as e:
+            print(f"Ошибка расчета веса: {str(e)}")
+            return None
 
-            if len(self.calibration_points) == 2:
-                f = interpolate.interp1d(pressures, weights, kind='linear', fill_value='extrapolate')
-            else:
-                f = interpolate.interp1d(pressures, weights, kind='quadratic', fill_value='extrapolate')
+    def calculate_weights(self, pressures, save=False):
+        """Calculate weights for many pressures in one vectorized evaluation"""
+        self.load_points()
+        if len(self.calibration_points) < 2:
+            return None
 
-            return float(f(pressure))
+        try:
+            if not hasattr(pressures, '__len__'):
+                pressures = list(pressures)
+            weights = self.get_evaluator().evaluate(pressures)
         except Exception as e:
             print(f"Ошибка расчета веса: {str(e)}")
             return None
 
+        if save:
+            self.save_calculations(zip(map(float, pressures), map(float, weights)))
+        return weights
+
     def save_calculation(self, pressure, weight):
         """Save calculation to history"""
+        return self.save_calculations([(pressure, weight)])
+
+    def save_calculations(self, results):
+        """Save many (pressure, weight) calculations to history in one transaction"""
         try:
-            location = self.current_location
-
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("""INSERT INTO weight_history (date, pressure, weight, location)
-                        VALUES (?, ?, ?, ?)""",
-                     (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                      pressure, weight, location))
-            conn.commit()
-            conn.close()
+            ts = int(datetime.now().timestamp())
+            rows = [(ts, pressure, weight) for pressure, weight in results]
+
+            with self._location_lock:
+                if not self.location_resolved:
+                    # Written right away without a location; the ids are kept
+                    # so that the lookup can fill them in once it finishes
+                    with self.db.writer() as conn:
+                        conn.executemany(HISTORY_INSERT, [row + (None,) for row in rows])
+                        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    self._unlocated_ids.extend(range(last_id - len(rows) + 1, last_id + 1))
+                    return True
+                location = self.current_location
+
+            rows = [row + (location,) for row in rows]
+            self.locations.intern(self.db, location)
+            if self.history_queue is not None:
+                self.history_queue.put_many(rows)
+                return True
+
+            with self.db.writer() as conn:
+                conn.executemany(HISTORY_INSERT, rows)
             return True
         except sqlite3.Error as e:
             print(f"Ошибка сохранения расчета: {str(e)}")
             return False
 
-    def get_calculation_history(self, page=1):
-        """Get calculation history with pagination"""
+    # Dates are formatted by SQLite for the whole page in the query itself
+    HISTORY_COLUMNS = f"""CASE WHEN h.ts > 0 THEN strftime('%m/%d/%Y', h.ts, 'unixepoch', 'localtime')
+                               ELSE COALESCE(strftime('%m/%d/%Y', h.date), h.date) END,
+                          h.pressure, h.weight, {LOCATION_NAME}, h.ts, h.id"""
+    HISTORY_FROM = f"weight_history h {LOCATION_JOIN}"
+
+    def get_history_page(self, cursor=None, limit=None):
+        """
+        Get history records newest first, starting after a keyset cursor
+
+        Returns:
+            Tuple of (records, next_cursor); next_cursor is None on the last page
+        """
+        limit = limit or self.items_per_page
+        with self.db.reader() as conn:
+            if cursor is None:
+                rows = conn.execute(f"""SELECT {self.HISTORY_COLUMNS}
+                                       FROM {self.HISTORY_FROM}
+                                       ORDER BY h.ts DESC, h.id DESC
+                                       LIMIT ?""", (limit,)).fetchall()
+            else:
+                rows = conn.execute(f"""SELECT {self.HISTORY_COLUMNS}
+                                       FROM {self.HISTORY_FROM}
+                                       WHERE (h.ts, h.id) < (?, ?)
+                                       ORDER BY h.ts DESC, h.id DESC
+                                       LIMIT ?""", (*cursor, limit)).fetchall()
+        next_cursor = (rows[-1][4], rows[-1][5]) if len(rows) == limit else None
+        return [row[:4] for row in rows], next_cursor
+
+    def get_recent_history(self, limit=None):
+        """
+        Get the newest history records, including calculations still in the write queue
+
+        Returns:
+            Tuple of (records, next_cursor); older records continue with get_history_page
+        """
+        limit = limit or self.items_per_page
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-
-            # Получаем общее количество записей
-            c.execute("SELECT COUNT(*) FROM weight_history")
-            total_records = c.fetchone()[0]
-
-            # Вычисляем смещение для текущей страницы
-            offset = (page - 1) * self.items_per_page
-
-            c.execute("""SELECT date, pressure, weight, location 
-                        FROM weight_history 
-                        ORDER BY date DESC 
-                        LIMIT ? OFFSET ?""",
-                     (self.items_per_page, offset))
-            history = c.fetchall()
-            conn.close()
-            return history, total_records
+            if self.history_queue is None:
+                return self.get_history_page(None, limit)
+
+            # Under the writer lock the queue cannot commit between the two
+            # reads, so no row is both pending and older than the cursor
+            with self.db.writer() as conn:
+                pending = self.history_queue.pending()[::-1]
+                newest = conn.execute("""SELECT ts, id FROM weight_history
+                                         ORDER BY ts DESC, id DESC LIMIT 1""").fetchone()
+            history = [(datetime.fromtimestamp(ts).strftime("%m/%d/%Y"), pressure, weight, location)
+                       for ts, pressure, weight, location in pending]
+            if newest is None:
+                return history, None
+            # Just after the newest stored row, so rows flushed later are skipped
+            cursor = (newest[0], newest[1] + 1)
+            if len(history) >= limit:
+                return history, cursor
+            stored, next_cursor = self.get_history_page(cursor, limit - len(history))
+            return history + stored, next_cursor
         except sqlite3.Error as e:
             print(f"Ошибка получения истории: {str(e)}")
-            return [], 0
+            return [], None
+
+    def export_history(self, destination, fmt=None, start=None, end=None, location=None):
+        """
+        Stream calculation history to a file or stream
+
+        Args:
+            destination: file path, or a text or binary stream
+            fmt: 'csv', 'csv.gz' or 'jsonl'; taken from the file name when omitted
+            start: first moment included (datetime, epoch seconds or ISO string)
+            end: first moment excluded
+            location: only rows of this location name
+
+        Returns:
+            Number of rows exported, or None if the export failed
+        """
+        try:
+            if self.history_queue is not None:
+                self.history_queue.flush()
+            return export_history(self.db, destination, fmt, start, end, location)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Ошибка экспорта истории: {str(e)}")
+            return None
+
+    def get_history_summary(self, start=None, end=None):
+        """
+        Get daily totals of history rolled up by the retention policy
+
+        Returns:
+            List of (day, location, count, min weight, max weight, mean weight)
+        """
+        try:
+            return get_daily_summary(self.db, start, end)
+        except sqlite3.Error as e:
+            print(f"Ошибка получения истории: {str(e)}")
+            return []
 
     def clear_history(self):
         """Clear calculation history"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("DELETE FROM weight_history")
-            conn.commit()
-            conn.close()
+            if self.history_queue is not None:
+                self.history_queue.flush()
+            with self.db.writer() as conn:
+                c = conn.cursor()
+                # weight_history has no triggers, so a bare DELETE empties it in
+                # one step. Unlike DROP TABLE this keeps the AUTOINCREMENT
+                # sequence, and ids of deleted rows are never handed out again.
+                c.execute("DELETE FROM weight_history")
+                c.execute("DROP TABLE IF EXISTS weight_history_daily")
+            with self._location_lock:
+                self._unlocated_ids = []
+            # Almost nothing is left in use, so converting an old database to
+            # incremental vacuum is cheap here
+            self.start_maintenance("reclaim", lambda: shrink_file(self.db))
             return True
         except sqlite3.Error as e:
             print(f"Ошибка очистки истории: {str(e)}")
@@ -412,74 +786,6 @@ def get_client_ip(page: ft.Page) -> str:
         print(f"Ошибка получения IP клиента: {str(e)}")
         return None
 
-@lru_cache(maxsize=1)
-def get_location_fallback(client_ip=None):
-    """Get location based on client IP"""
-    try:
-        # Используем несколько сервисов с приоритетом точности
-        services = [
-            {
-                'url': f'https://ipapi.co/{client_ip}/json/' if client_ip else 'https://ipapi.co/json/',
-                'priority': 1,
-                'fields': {'city': 'city', 'region': 'region', 'country': 'country_name'}
-            },
-            {
-                'url': f'https://ipwho.is/{client_ip}' if client_ip else 'https://ipwho.is/',
-                'priority': 2,
-                'fields': {'city': 'city', 'region': 'region', 'country': 'country'}
-            },
-            {
-                'url': f'https://ip-api.com/json/{client_ip}' if client_ip else 'https://ip-api.com/json/',
-                'priority': 3,
-                'fields': {'city': 'city', 'region': 'regionName', 'country': 'country'}
-            }
-        ]
-
-        print(f"Определение местоположения для IP: {client_ip}")
-
-        for service in services:
-            try:
-                response = requests.get(
-                    service['url'],
-                    timeout=5,
-                    headers={
-                        'User-Agent': 'Mozilla/5.0',
-                        'Accept': 'application/json'
-                    }
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    print(f"Ответ от {service['url']}: {data}")
-                    location_parts = []
-                    fields = service['fields']
-
-                    # Получаем и проверяем каждую часть адреса
-                    city = data.get(fields['city'])
-                    region = data.get(fields['region'])
-                    country = data.get(fields['country'])
-
-                    # Валидация данных
-                    if city and len(city) > 1 and not city.isdigit():
-                        location_parts.append(city)
-                    if region and len(region) > 1 and not region.isdigit():
-                        location_parts.append(region)
-                    if country and len(country) > 1 and not country.isdigit():
-                        location_parts.append(country)
-
-                    if location_parts:
-                        result = ', '.join(location_parts)
-                        print(f"Определено местоположение: {result}")
-                        return result
-
-            except Exception as e:
-                print(f"Ошибка сервиса {service['url']}: {str(e)}")
-                continue
-
-    except Exception as e:
-        print(f"Общая ошибка определения местоположения: {str(e)}")
-    return "Неизвестно"
-
 def main(page: ft.Page):
     logger.info("Starting application...")
     try:
@@ -533,6 +839,7 @@ def main(page: ft.Page):
             edit_button.text = get_text("edit")
             save_button.text = get_text("save")
             clear_history_button.text = get_text("clear_history")
+            update_history_texts()
             min_points_msg.value = get_text("min_points_msg")
             page.update()
 
@@ -553,12 +860,11 @@ def main(page: ft.Page):
         def save_changes(e):
             nonlocal editing_mode
             try:
-                for point_id, new_values in edited_values.items():
-                    if not calc.edit_point(point_id, new_values['pressure'], new_values['weight']):
-                        result_text.value = get_text("changes_error")
-                        result_text.color = ft.colors.RED
-                        page.update()
-                        return
+                if edited_values and not calc.apply_point_changes(edits=edited_values):
+                    result_text.value = get_text("changes_error")
+                    result_text.color = ft.colors.RED
+                    page.update()
+                    return
 
                 result_text.value = get_text("changes_saved")
                 result_text.color = ft.colors.GREEN
@@ -592,109 +898,134 @@ def main(page: ft.Page):
                 result_text.color = ft.colors.RED
                 page.update()
 
-        def create_data_table():
-            points = calc.load_points()
-            if not points:
-                return ft.Text(get_text("point_error"))
-
-            table = ft.Column(
-                controls=[
-                    ft.Container(
-                        content=ft.Row(
-                            [
-                                ft.Text(get_text("edit"), width=50, size=14),
-                                ft.Text(get_text("pressure"), width=100, size=14),
-                                ft.Text(get_text("weight"), width=100, size=14),
-                                ft.Text("", width=30),
-                            ],
-                            spacing=0,
-                        ),
-                        padding=10,
-                        bgcolor=ft.colors.BLUE_50,
+        # Rows of the calibration points table by point id. Controls are kept
+        # between updates and only changed properties are sent to the client.
+        point_rows = {}
+
+        def create_point_row(point_id):
+            def delete_button():
+                return ft.Container(
+                    content=ft.IconButton(
+                        icon=ft.icons.DELETE_FOREVER,
+                        icon_color=ft.colors.RED_500,
+                        width=30,
+                        icon_size=24,
+                        on_click=lambda e: delete_point(point_id),
                     ),
-                ],
-                spacing=2,
-            )
-
-            for point in points:
-                if editing_mode:
-                    row = ft.Container(
-                        content=ft.Row(
-                            [
-                                ft.Text(f"{point[0]}", width=50, size=14),
-                                ft.TextField(
-                                    value=str(edited_values.get(point[0], {}).get('pressure', point[1])),
-                                    width=100,
-                                    height=40,
-                                    text_size=14,
-                                    on_change=lambda e, pid=point[0]: on_value_change(e, pid, 'pressure'),
-                                ),
-                                ft.TextField(
-                                    value=str(edited_values.get(point[0], {}).get('weight', point[2])),
-                                    width=100,
-                                    height=40,
-                                    text_size=14,
-                                    on_change=lambda e, pid=point[0]: on_value_change(e, pid, 'weight'),
-                                ),
-                                ft.Container(
-                                    content=ft.IconButton(
-                                        icon=ft.icons.DELETE_FOREVER,
-                                        icon_color=ft.colors.RED_500,
-                                        width=30,
-                                        icon_size=24,
-                                        tooltip=get_text("clear_history"),
-                                        on_click=lambda e, pid=point[0]: delete_point(pid),
-                                    ),
-                                    margin=ft.margin.only(left=-12),
-                                ),
-                            ],
-                            spacing=0,
-                        ),
-                        padding=5,
-                    )
-                else:
-                    row = ft.Container(
-                        content=ft.Row(
-                            [
-                                ft.Text(f"{point[0]}", width=50, size=14),
-                                ft.Text(f"{point[1]:.2f}", width=100, size=14),
-                                ft.Text(f"{point[2]:.2f}", width=100, size=14),
-                                ft.Container(
-                                    content=ft.IconButton(
-                                        icon=ft.icons.DELETE_FOREVER,
-                                        icon_color=ft.colors.RED_500,
-                                        width=30,
-                                        icon_size=24,
-                                        tooltip=get_text("clear_history"),
-                                        on_click=lambda e, pid=point[0]: delete_point(pid),
-                                    ),
-                                    margin=ft.margin.only(left=-12),
-                                ),
-
-                            ],
-                            spacing=0,
-                        ),
-                        padding=5,
-                    )
-                table.controls.append(row)
+                    margin=ft.margin.only(left=-12),
+                )
 
-            buttons = ft.Row(
-                [
-                    ft.ElevatedButton(
-                        get_text("edit") if not editing_mode else get_text("cancel"),
-                        on_click=toggle_edit_mode,
-                    ),
-                    ft.ElevatedButton(
-                        get_text("save"),
-                        visible=editing_mode,
-                        on_click=save_changes,
-                    ),
-                ],
-                alignment=ft.MainAxisAlignment.CENTER,
-                spacing=10,
+            row = {
+                'pressure_text': ft.Text(width=100, size=14),
+                'weight_text': ft.Text(width=100, size=14),
+                'pressure_field': ft.TextField(
+                    width=100,
+                    height=40,
+                    text_size=14,
+                    on_change=lambda e: on_value_change(e, point_id, 'pressure'),
+                ),
+                'weight_field': ft.TextField(
+                    width=100,
+                    height=40,
+                    text_size=14,
+                    on_change=lambda e: on_value_change(e, point_id, 'weight'),
+                ),
+                'delete': delete_button(),
+            }
+            row['container'] = ft.Container(
+                content=ft.Row(
+                    [
+                        ft.Text(f"{point_id}", width=50, size=14),
+                        row['pressure_text'],
+                        row['weight_text'],
+                        row['pressure_field'],
+                        row['weight_field'],
+                        row['delete'],
+                    ],
+                    spacing=0,
+                ),
+                padding=5,
             )
+            return row
+
+        def refresh_point_row(row, point):
+            edited = edited_values.get(point[0], {})
+            row['pressure_text'].value = f"{point[1]:.2f}"
+            row['weight_text'].value = f"{point[2]:.2f}"
+            row['pressure_field'].value = str(edited.get('pressure', point[1]))
+            row['weight_field'].value = str(edited.get('weight', point[2]))
+            for key in ('pressure_text', 'weight_text'):
+                row[key].visible = not editing_mode
+            for key in ('pressure_field', 'weight_field'):
+                row[key].visible = editing_mode
+            row['delete'].content.tooltip = get_text("clear_history")
+
+        points_header = {
+            'edit': ft.Text(width=50, size=14),
+            'pressure': ft.Text(width=100, size=14),
+            'weight': ft.Text(width=100, size=14),
+        }
+        points_table = ft.Column(
+            controls=[
+                ft.Container(
+                    content=ft.Row(
+                        [
+                            points_header['edit'],
+                            points_header['pressure'],
+                            points_header['weight'],
+                            ft.Text("", width=30),
+                        ],
+                        spacing=0,
+                    ),
+                    padding=10,
+                    bgcolor=ft.colors.BLUE_50,
+                ),
+            ],
+            spacing=2,
+        )
+        no_points_text = ft.Text()
+        edit_mode_button = ft.ElevatedButton(on_click=toggle_edit_mode)
+        save_points_button = ft.ElevatedButton(on_click=save_changes)
+        points_view = ft.Column(
+            [
+                no_points_text,
+                points_table,
+                ft.Row(
+                    [edit_mode_button, save_points_button],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    spacing=10,
+                ),
+            ],
+            spacing=20,
+        )
+
+        def update_data_table():
+            """Diff the points against the cached rows; the caller sends one page.update()"""
+            points = calc.load_points()
+            for point_id in point_rows.keys() - {point[0] for point in points}:
+                del point_rows[point_id]
 
-            return ft.Column([table, buttons], spacing=20)
+            rows = []
+            for point in points:
+                row = point_rows.get(point[0])
+                if row is None:
+                    row = point_rows[point[0]] = create_point_row(point[0])
+                refresh_point_row(row, point)
+                rows.append(row['container'])
+            # Same control objects in a new list: only insertions and removals are sent
+            points_table.controls = points_table.controls[:1] + rows
+
+            no_points_text.value = get_text("point_error")
+            no_points_text.visible = not points
+            points_table.visible = bool(points)
+            points_header['edit'].value = get_text("edit")
+            points_header['pressure'].value = get_text("pressure")
+            points_header['weight'].value = get_text("weight")
+            edit_mode_button.text = get_text("edit") if not editing_mode else get_text("cancel")
+            edit_mode_button.visible = bool(points)
+            save_points_button.text = get_text("save")
+            save_points_button.visible = editing_mode and bool(points)
+            return points_view
 
         pressure_input = ft.TextField(
             label=get_text("pressure"),
@@ -731,14 +1062,11 @@ def main(page: ft.Page):
                 pressures = [p[1] for p in calc.calibration_points]
                 weights = [p[2] for p in calc.calibration_points]
 
-                x_interp = np.linspace(min(pressures), max(pressures), 50)
-
-                if len(calc.calibration_points) == 2:
-                    f = interpolate.interp1d(pressures, weights, kind='linear')
-                else:
-                    f = interpolate.interp1d(pressures, weights, kind='quadratic')
-
-                y_interp = f(x_interp)
+                step = (max(pressures) - min(pressures)) / 49
+                x_interp = [min(pressures) + step * i for i in range(50)]
+                # 50 scalar calls are cheaper than importing NumPy before the first frame
+                model = calc.get_model()
+                y_interp = [model(x) for x in x_interp]
 
                 chart = ft.LineChart(
                     tooltip_bgcolor=ft.colors.with_opacity(0.8, ft.colors.WHITE),
@@ -776,7 +1104,7 @@ def main(page: ft.Page):
         def update_display():
             try:
                 chart_container.content = create_chart()
-                data_table_container.content = create_data_table()
+                update_data_table()
                 page.update()
             except Exception as e:
                 result_text.value = f"Ошибка обновления: {str(e)}"
@@ -809,10 +1137,11 @@ def main(page: ft.Page):
                 result = calc.calculate_weight(pressure)
 
                 if result is not None:
-                    calc.save_calculation(pressure, result)
+                    if calc.save_calculation(pressure, result):
+                        prepend_history((datetime.now().strftime("%m/%d/%Y"), pressure, result,
+                                         calc.current_location))
                     result_text.value = f"Расчетный вес: {result:.2f}"
                     result_text.color = ft.colors.BLACK
-                    history_container.content = create_history_table()
                 else:
                     result_text.value = get_text("min_points_msg")
                     result_text.color = ft.colors.RED
@@ -822,117 +1151,118 @@ def main(page: ft.Page):
                 result_text.color = ft.colors.RED
                 page.update()
 
-        def create_history_table():
-            history, total_records = calc.get_calculation_history(calc.current_page)
-            if not history:
-                return ft.Column([
-                    ft.Text(get_text("calculation_history")),
-                    ft.ElevatedButton(
-                        get_text("clear_history"),
-                        on_click=clear_history,
-                        style=ft.ButtonStyle(
-                            color=ft.colors.WHITE,
-                            bgcolor=ft.colors.RED_400,
-                        ),
-                    ),
-                ])
-
-            table = ft.DataTable(
-                columns=[
-                    ft.DataColumn(ft.Text(get_text("date"), size=12)),
-                    ft.DataColumn(ft.Text(get_text("pressure"), size=12), numeric=True),
-                    ft.DataColumn(ft.Text(get_text("weight"), size=12), numeric=True),
-                    ft.DataColumn(ft.Text(get_text("location"), size=12)),
-                ],
-                column_spacing=20,
-                horizontal_margin=10,
-                rows=[
-                    ft.DataRow(
-                        cells=[
-                            ft.DataCell(
-                                ft.Text(
-                                    datetime.strptime(record[0], "%Y-%m-%d %H:%M:%S").strftime("%m/%d/%Y"),
-                                    size=12,
-                                    text_align=ft.TextAlign.LEFT,
-                                )
-                            ),
-                            ft.DataCell(
-                                ft.Text(
-                                    f"{record[1]:.2f}",
-                                    size=12,
-                                    text_align=ft.TextAlign.LEFT,
-                                )
-                            ),
-                            ft.DataCell(
-                                ft.Text(
-                                    f"{record[2]:.2f}",
-                                    size=12,
-                                    text_align=ft.TextAlign.LEFT,
-                                )
-                            ),
-                            ft.DataCell(
-                                ft.Container(
-                                    content=ft.Text(
-                                        record[3].replace(', ', ',\n'),
-                                        size=12,
-                                        width=page.width * 0.35,
-                                        max_lines=2,
-                                        text_align=ft.TextAlign.LEFT,
-                                        overflow=ft.TextOverflow.ELLIPSIS
-                                    ),
-                                    padding=ft.padding.symmetric(horizontal=5)
-                                )
-                            ),
-                        ],
-                    )
-                    for record in history
-                ],
-            )
-
-            total_pages = (total_records + calc.items_per_page - 1) // calc.items_per_page
-            pagination = ft.Row(
-                [
-                    ft.IconButton(
-                        ft.icons.ARROW_BACK,
-                        on_click=lambda e: change_page(-1),
-                        disabled=calc.current_page == 1,
-                    ),
-                    ft.Text(f"{get_text('page')} {calc.current_page}/{total_pages}"),
-                    ft.IconButton(
-                        ft.icons.ARROW_FORWARD,
-                        on_click=lambda e: change_page(1),
-                        disabled=calc.current_page == total_pages,
-                    ),
-                ],
-                alignment=ft.MainAxisAlignment.CENTER,
-            )
-
-            clear_button = ft.ElevatedButton(
-                get_text("clear_history"),
-                on_click=clear_history,
-                style=ft.ButtonStyle(
-                    color=ft.colors.WHITE,
-                    bgcolor=ft.colors.RED_400,
+        # History is an infinite list: the newest page is loaded first and older
+        # pages are fetched by keyset cursor as the list is scrolled to the end.
+        # Row controls are kept and rebound to new records on reload, and a new
+        # calculation is inserted at the top without touching the other rows.
+        history_row_height = 48
+        history_rows = []
+        history_pool = []
+        history_cursor = None
+        history_lock = threading.Lock()
+        # Records of this session shown before its location was known
+        unlocated_records = []
+
+        def create_history_row():
+            cells = [
+                ft.Text(size=12, expand=2),
+                ft.Text(size=12, expand=2),
+                ft.Text(size=12, expand=2),
+                ft.Text(size=12, expand=3, max_lines=2, overflow=ft.TextOverflow.ELLIPSIS),
+            ]
+            return {
+                'cells': cells,
+                'record': None,
+                'container': ft.Container(
+                    content=ft.Row(cells, spacing=10),
+                    height=history_row_height,
+                    padding=ft.padding.symmetric(horizontal=10),
                 ),
-            )
+            }
 
-            return ft.Column([
-                table,
-                ft.Container(content=pagination, margin=ft.margin.symmetric(vertical=20)),
-                ft.Container(content=clear_button, alignment=ft.alignment.center),
-            ])
+        def bind_history_row(row, record):
+            row['record'] = record
+            date_text, pressure_text, weight_text, location_text = row['cells']
+            date_text.value = record[0]
+            pressure_text.value = f"{record[1]:.2f}"
+            weight_text.value = f"{record[2]:.2f}"
+            location_text.value = (record[3] or get_text("unknown")).replace(', ', ',\n')
+            return row
+
+        def take_history_row(record):
+            return bind_history_row(history_pool.pop() if history_pool else create_history_row(), record)
+
+        def show_history_rows():
+            history_list.controls = [row['container'] for row in history_rows]
+            history_list.visible = bool(history_rows)
+            history_header.visible = bool(history_rows)
+            no_history_text.visible = not history_rows
+
+        def reload_history():
+            """Load the newest page again, reusing the rows already on screen"""
+            nonlocal history_cursor
+            with history_lock:
+                records, history_cursor = calc.get_recent_history()
+                kept = history_rows[:len(records)]
+                history_pool.extend(history_rows[len(records):])
+                history_rows[:] = [bind_history_row(row, record) for row, record in zip(kept, records)]
+                history_rows.extend(take_history_row(record) for record in records[len(kept):])
+                show_history_rows()
+
+        def prepend_history(record):
+            with history_lock:
+                if record[3] is None:
+                    if calc.location_resolved:
+                        record = record[:3] + (calc.current_location,)
+                    else:
+                        unlocated_records.append(record)
+                history_rows.insert(0, take_history_row(record))
+                history_list.controls.insert(0, history_rows[0]['container'])
+                show_history_rows()
+
+        def load_more_history(e):
+            nonlocal history_cursor
+            if history_cursor is None or e.pixels < e.max_scroll_extent - 5 * history_row_height:
+                return
+            # Scroll events keep coming while a page is loading; one load is enough
+            if not history_lock.acquire(blocking=False):
+                return
+            try:
+                records, history_cursor = calc.get_history_page(history_cursor)
+                rows = [take_history_row(record) for record in records]
+                history_rows.extend(rows)
+                history_list.controls.extend(row['container'] for row in rows)
+                history_list.update()
+            except sqlite3.Error as error:
+                print(f"Ошибка получения истории: {str(error)}")
+            finally:
+                history_lock.release()
+
+        def on_location_resolved(location):
+            """Show the location on rows saved while the lookup was running"""
+            with history_lock:
+                pending = {id(record) for record in unlocated_records}
+                if location:
+                    for row in history_rows:
+                        if id(row['record']) in pending:
+                            bind_history_row(row, row['record'][:3] + (location,))
+                unlocated_records.clear()
+            if location and pending:
+                page.update()
 
-        def change_page(delta):
-            calc.current_page += delta
-            history_container.content = create_history_table()
-            page.update()
+        def update_history_texts():
+            for text, key in zip(history_header.content.controls, ("date", "pressure", "weight", "location")):
+                text.value = get_text(key)
+            no_history_text.value = get_text("calculation_history")
+            for row in history_rows:
+                if not row['record'][3]:
+                    row['cells'][3].value = get_text("unknown")
 
         def clear_history(e):
             if calc.clear_history():
                 result_text.value = get_text("changes_saved")
                 result_text.color = ft.colors.GREEN
-                calc.current_page = 1
-                history_container.content = create_history_table()
+                reload_history()
             else:
                 result_text.value = get_text("changes_error")
                 result_text.color = ft.colors.RED
@@ -981,12 +1311,35 @@ def main(page: ft.Page):
         )
 
         data_table_container = ft.Container(
-            content=create_data_table(),
+            content=update_data_table(),
             padding=10,
         )
 
+        history_header = ft.Container(
+            content=ft.Row(
+                [
+                    ft.Text(get_text("date"), size=12, expand=2, weight=ft.FontWeight.BOLD),
+                    ft.Text(get_text("pressure"), size=12, expand=2, weight=ft.FontWeight.BOLD),
+                    ft.Text(get_text("weight"), size=12, expand=2, weight=ft.FontWeight.BOLD),
+                    ft.Text(get_text("location"), size=12, expand=3, weight=ft.FontWeight.BOLD),
+                ],
+                spacing=10,
+            ),
+            padding=ft.padding.symmetric(horizontal=10),
+        )
+        # A fixed item extent lets the client build only the rows in view
+        history_list = ft.ListView(
+            height=get_size(400, 300),
+            item_extent=history_row_height,
+            on_scroll=load_more_history,
+            on_scroll_interval=100,
+        )
+        no_history_text = ft.Text(get_text("calculation_history"))
+        reload_history()
+        if not calc.location_resolved:
+            calc.start_location_lookup(on_resolved=on_location_resolved)
+
         history_container = ft.Container(
-            content=create_history_table(),
             padding=10,
             border=ft.border.all(1, ft.colors.GREY_400),
             border_radius=10,
@@ -999,18 +1352,17 @@ def main(page: ft.Page):
             add_button.width = get_size(400, page.width * 0.9)
             calc_button.width = get_size(400, page.width * 0.9)
             chart_container.height = get_size(400, 300)
+            history_list.height = get_size(400, 300)
             page.update()
 
         page.on_resize = on_resize
 
         def on_view_pop(view):
             try:
-                calc.current_location = get_location_fallback(calc.client_ip)
+                calc.start_location_lookup(on_resolved=on_location_resolved)
                 page.update()
             except Exception as e:
                 print(f"Ошибка обработки местоположения: {str(e)}")
-                calc.current_location = get_location_fallback(calc.client_ip)
-                page.update()
 
         page.on_view_pop = on_view_pop
 
@@ -1051,8 +1403,18 @@ def main(page: ft.Page):
         )
         clear_history_button = ft.ElevatedButton(
             get_text("clear_history"),
-            on_click=clear_history
+            on_click=clear_history,
+            style=ft.ButtonStyle(
+                color=ft.colors.WHITE,
+                bgcolor=ft.colors.RED_400,
+            ),
         )
+        history_container.content = ft.Column([
+            history_header,
+            history_list,
+            no_history_text,
+            ft.Container(content=clear_history_button, alignment=ft.alignment.center),
+        ])
 
         page.add(
             ft.Container(
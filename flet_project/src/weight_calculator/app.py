@@ -5,13 +5,17 @@ import toga
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW
 from database import init_db, add_calibration_point, get_all_points
-from interpolation import linear_interpolation, quadratic_interpolation
+from interpolation import IncrementalPolyFit
 
 class WeightCalculator(toga.App):
     def startup(self):
         # Initialize database
         init_db()
 
+        # Fit is updated point by point instead of refitting on every calculation
+        self._fit_points = None
+        self._refresh_fit()
+
         # Create main window
         self.main_window = toga.MainWindow(title=self.name)
 
@@ -78,11 +82,27 @@ class WeightCalculator(toga.App):
         self.main_window.content = main_box
         self.main_window.show()
 
+    def _refresh_fit(self):
+        """Refit when the stored points changed, including writes from other connections"""
+        # get_all_points() returns the same list object until the table changes
+        points = get_all_points()
+        if points is not self._fit_points:
+            self.fit = IncrementalPolyFit(points)
+            self._fit_points = points
+
     def add_point(self, widget):
         try:
             pressure = float(self.pressure_input.value)
             weight = float(self.weight_input.value)
+            in_sync = get_all_points() is self._fit_points
             if add_calibration_point(pressure, weight):
+                if in_sync:
+                    self.fit.add(pressure, weight)
+                    self._fit_points = get_all_points()
+                    if len(self._fit_points) != len(self.fit):
+                        # Another connection wrote in the meantime
+                        self._fit_points = None
+                self._refresh_fit()
                 self.main_window.info_dialog(
                     'Успех',
                     'Точка калибровки добавлена'
@@ -103,23 +123,30 @@ class WeightCalculator(toga.App):
     def calculate_weight(self, widget):
         try:
             pressure = float(self.calc_input.value)
-            points = get_all_points()
-            if len(points) >= 2:
-                if len(points) == 2:
-                    result = linear_interpolation(pressure, points)
-                else:
-                    result = quadratic_interpolation(pressure, points)
-                self.result_label.text = f'Результат: {result:.2f}'
-            else:
-                self.main_window.error_dialog(
-                    'Ошибка',
-                    'Необходимо минимум 2 точки калибровки'
-                )
         except ValueError:
             self.main_window.error_dialog(
                 'Ошибка',
                 'Введите корректное числовое значение'
             )
+            return
+
+        self._refresh_fit()
+        if len(self.fit) < 2:
+            self.main_window.error_dialog(
+                'Ошибка',
+                'Необходимо минимум 2 точки калибровки'
+            )
+            return
+
+        try:
+            result = self.fit(pressure)
+        except ValueError:
+            self.main_window.error_dialog(
+                'Ошибка',
+                'Не удалось построить калибровочную кривую, проверьте точки калибровки'
+            )
+            return
+        self.result_label.text = f'Результат: {result:.2f}'
 
 def main():
     return WeightCalculator('Калькулятор веса', 'org.weightcalc')
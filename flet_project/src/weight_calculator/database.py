@@ -1,17 +1,421 @@
+import atexit
+import os
 import sqlite3
+import threading
+import time
+from pathlib import Path
 from typing import List, Tuple
 from contextlib import contextmanager
 
 DATABASE_NAME = "calibration.db"
 
+# Prepared statements kept per connection, keyed by SQL text
+CACHED_STATEMENTS = 256
+
+# Idle read-only connections kept open per database file
+MAX_IDLE_READERS = 4
+
+# PRAGMA settings applied to every new connection. "rollback" uses SQLite's
+# rollback journal, switching back a file left in WAL by another profile;
+# the WAL profiles let readers run alongside the writer. All profiles use
+# incremental auto_vacuum so retention can hand freed pages back. It comes
+# first: it only applies to a file that has no tables yet, and switching
+# to WAL already writes the first page.
+STORAGE_PROFILES = {
+    "rollback": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "DELETE",
+    },
+    "wal": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -8000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "wal_durable": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "wal_fast": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -16000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+# Stored in the database file rather than the connection
+PERSISTENT_PRAGMAS = ("auto_vacuum", "journal_mode")
+
+DEFAULT_PROFILE = os.environ.get("WEIGHTCALC_STORAGE_PROFILE", "wal")
+
+
+class SharedInstances:
+    """
+    One instance per key for the whole process.
+
+    Subclasses expose a classmethod that builds the key and calls
+    _shared(), so all sessions asking for the same key, usually a
+    database file, get the same object. Every subclass keeps its own
+    registry and lock.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._instances = {}
+        cls._instances_lock = threading.Lock()
+
+    @classmethod
+    def _shared(cls, key, create, reuse=None):
+        """
+        Instance registered for key, made by create() if there is none yet
+
+        reuse, if given, is asked whether a registered instance can still
+        be handed out; if it cannot, a new one replaces it.
+        """
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None or (reuse is not None and not reuse(instance)):
+                instance = cls._instances[key] = create()
+            return instance
+
+
+class ConnectionManager(SharedInstances):
+    """
+    Long-lived SQLite connections for one database file.
+
+    There is a single writer connection, shared by all threads and
+    serialized by a lock, and a small pool of read-only connections that
+    are checked out for the length of a reader() block. Because the
+    connections stay open, sqlite3's per-connection statement cache keeps
+    every query prepared between calls, and short-lived threads do not
+    leave connections behind. Get managers through for_path().
+
+    Every new connection gets the PRAGMAs of its storage profile (see
+    STORAGE_PROFILES); journal_mode and auto_vacuum are only set by the
+    writer, since they are persistent and need write access.
+    """
+
+    def __init__(self, path: str, profile: str = None):
+        self.path = os.path.abspath(path)
+        self.profile = profile or DEFAULT_PROFILE
+        if self.profile not in STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile: {self.profile}")
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._idle_readers = []
+        self._readers_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: str, profile: str = None) -> "ConnectionManager":
+        """Get the shared manager for a database file; profile only applies when it is created"""
+        key = os.path.abspath(path)
+        return cls._shared(key, lambda: cls(key, profile))
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            conn = sqlite3.connect(f"{Path(self.path).as_uri()}?mode=ro", uri=True,
+                                   check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+        for name, value in STORAGE_PROFILES[self.profile].items():
+            if name in PERSISTENT_PRAGMAS and read_only:
+                continue
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """
+        Writer connection inside a transaction
+
+        Commits when the outermost block exits and rolls back on error;
+        nested blocks join the enclosing transaction.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect(read_only=False)
+            self._write_depth += 1
+            try:
+                yield self._writer
+                if self._write_depth == 1:
+                    self._writer.commit()
+            except BaseException:
+                if self._write_depth == 1:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+
+    @contextmanager
+    def reader(self):
+        """
+        Read-only connection checked out of the pool for the block
+
+        It goes back to the pool when the block exits; connections beyond
+        MAX_IDLE_READERS idle ones are closed instead.
+        """
+        with self._readers_lock:
+            conn = self._idle_readers.pop() if self._idle_readers else None
+        if conn is None:
+            try:
+                conn = self._connect(read_only=True)
+            except sqlite3.OperationalError:
+                # Database file does not exist yet; read through the writer
+                with self.writer() as writer:
+                    yield writer
+                return
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._readers_lock:
+                if len(self._idle_readers) < MAX_IDLE_READERS:
+                    self._idle_readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        """Close all idle connections; they are reopened on next use"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            idle, self._idle_readers = self._idle_readers, []
+        for conn in idle:
+            conn.close()
+
+
+class WriteBehindQueue(SharedInstances):
+    """
+    Buffers rows for one INSERT statement and writes them in the background.
+
+    Rows are flushed with a single executemany and one commit once
+    `max_batch` rows are waiting or the oldest has waited `max_delay`
+    seconds, so a burst of writes costs one disk sync instead of one per
+    row. Everything still queued is flushed by close(), which also runs at
+    interpreter exit. Rows not yet committed are visible through pending();
+    read it under the manager's writer lock to see each row exactly once,
+    either pending or in the table.
+    """
+
+    def __init__(self, manager: ConnectionManager, sql: str, max_batch: int = 100, max_delay: float = 0.5):
+        self.manager = manager
+        self.sql = sql
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queued = []
+        self._in_flight = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        atexit.register(self.close)
+
+    @classmethod
+    def shared(cls, manager: ConnectionManager, sql: str, **kwargs) -> "WriteBehindQueue":
+        """Get the queue shared by all sessions for a database and statement"""
+        return cls._shared((manager.path, sql), lambda: cls(manager, sql, **kwargs),
+                           reuse=lambda queue: not queue._closed)
+
+    def put(self, row: tuple):
+        """Queue one row"""
+        self.put_many([row])
+
+    def put_many(self, rows):
+        """Queue several rows"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write queue is closed")
+            self._queued.extend(rows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def pending(self) -> list:
+        """Rows queued or being written but not committed yet, oldest first"""
+        with self._condition:
+            return self._in_flight + self._queued
+
+    def flush(self):
+        """Write all queued rows now in one transaction"""
+        with self._flush_lock:
+            with self._condition:
+                rows, self._queued = self._queued, []
+                self._in_flight = rows
+            if not rows:
+                return
+            try:
+                with self.manager.writer() as conn:
+                    conn.executemany(self.sql, rows)
+                    # Still under the writer lock, so whoever holds it sees
+                    # each row either pending or committed, never both
+                    with self._condition:
+                        self._in_flight = []
+            except sqlite3.Error as e:
+                print(f"Ошибка записи очереди: {str(e)}")
+                with self._condition:
+                    self._queued = rows + self._queued
+                raise
+            finally:
+                with self._condition:
+                    self._in_flight = []
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queued and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                # Give the batch max_delay seconds to fill up
+                deadline = time.monotonic() + self.max_delay
+                while len(self._queued) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Rows were requeued; try again after the next delay
+                time.sleep(self.max_delay)
+
+    def close(self):
+        """Flush queued rows and stop the background writer"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+def migrate_in_chunks(manager: ConnectionManager, statement, chunk_size: int = 500,
+                      pause: float = 0.01) -> int:
+    """
+    Repeat a data migration statement in small transactions until it changes nothing
+
+    The statement takes the chunk size as its only parameter and must make
+    the rows it touched stop matching, e.g.
+    ``UPDATE t SET x = ... WHERE id IN (SELECT id FROM t WHERE x IS NULL LIMIT ?)``.
+    A sequence of statements is run in order in each transaction, and the
+    last one decides when the migration is done. The writer lock is
+    released between chunks so other writes are never blocked for long.
+
+    Returns:
+        Total number of rows changed by the last statement
+    """
+    statements = [statement] if isinstance(statement, str) else list(statement)
+    total = 0
+    while True:
+        with manager.writer() as conn:
+            for sql in statements:
+                changed = conn.execute(sql, (chunk_size,)).rowcount
+        total += changed
+        if changed <= 0:
+            return total
+        time.sleep(pause)
+
+
+def install_change_counter(conn: sqlite3.Connection, table: str):
+    """
+    Count changes to a table in change_counters, maintained by triggers
+
+    Lets caches tell whether a commit seen through PRAGMA data_version
+    touched this table or some other one.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS change_counters
+                    (name TEXT PRIMARY KEY,
+                     value INTEGER NOT NULL)""")
+    conn.execute("INSERT OR IGNORE INTO change_counters (name, value) VALUES (?, 0)", (table,))
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_changes_{event.lower()}
+                         AFTER {event} ON {table} BEGIN
+                             UPDATE change_counters SET value = value + 1 WHERE name = '{table}';
+                         END""")
+
+
+class TableCache(SharedInstances):
+    """
+    Process-wide cache of a query over one table.
+
+    A dedicated connection checks PRAGMA data_version, which only changes
+    when some connection commits. When it has changed, the table's change
+    counter (see install_change_counter) tells whether this table was
+    written; the query is re-run only then. A cache hit costs one PRAGMA
+    and returns the same list object as before.
+    """
+
+    def __init__(self, manager: ConnectionManager, table: str, query: str):
+        self.manager = manager
+        self.table = table
+        self.query = query
+        self._conn = None
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._counter = None
+        self._rows = None
+
+    @classmethod
+    def shared(cls, manager: ConnectionManager, table: str, query: str) -> "TableCache":
+        """Get the cache shared by all sessions for a database and query"""
+        return cls._shared((manager.path, query), lambda: cls(manager, table, query))
+
+    def get(self) -> list:
+        """Cached query result, refreshed if the table changed since the last call"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.manager.path, check_same_thread=False,
+                                             cached_statements=CACHED_STATEMENTS)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._rows is not None and data_version == self._data_version:
+                return self._rows
+
+            row = self._conn.execute("SELECT value FROM change_counters WHERE name = ?",
+                                     (self.table,)).fetchone()
+            counter = row[0] if row else None
+            if self._rows is None or counter is None or counter != self._counter:
+                self._rows = self._conn.execute(self.query).fetchall()
+            self._data_version = data_version
+            self._counter = counter
+            return self._rows
+
+    def invalidate(self):
+        """Force the next get() to re-run the query"""
+        with self._lock:
+            self._rows = None
+
+
+def get_manager() -> ConnectionManager:
+    """Connection manager for DATABASE_NAME"""
+    return ConnectionManager.for_path(DATABASE_NAME)
+
+
 @contextmanager
 def get_db_connection():
-    """Create database connection context manager"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    try:
+    """Shared writer connection; changes are committed when the block exits"""
+    with get_manager().writer() as conn:
         yield conn
-    finally:
-        conn.close()
 
 def init_db():
     """Initialize database and create necessary tables"""
@@ -25,7 +429,7 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """)
-        conn.commit()
+        install_change_counter(conn, "calibration_points")
 
 def add_calibration_point(pressure: float, weight: float) -> bool:
     """Add new calibration point to database"""
@@ -36,19 +440,17 @@ def add_calibration_point(pressure: float, weight: float) -> bool:
                 "INSERT INTO calibration_points (pressure, weight) VALUES (?, ?)",
                 (pressure, weight)
             )
-            conn.commit()
             return True
     except sqlite3.Error:
         return False
 
 def get_all_points() -> List[Tuple[float, float]]:
     """Get all calibration points from database"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT pressure, weight FROM calibration_points ORDER BY pressure"
-        )
-        return cursor.fetchall()
+    return TableCache.shared(
+        get_manager(),
+        "calibration_points",
+        "SELECT pressure, weight FROM calibration_points ORDER BY pressure"
+    ).get()
 
 def clear_all_points() -> bool:
     """Remove all calibration points from database"""
@@ -56,7 +458,6 @@ def clear_all_points() -> bool:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM calibration_points")
-            conn.commit()
             return True
     except sqlite3.Error:
         return False
@@ -0,0 +1,100 @@
+"""
+Import-time report for the application entry point
+
+Runs the entry module in a fresh interpreter with ``-X importtime`` and
+reports how long each imported module took, so that startup regressions
+(for example a heavy scientific or network module imported at the top of
+main.py) can be caught against a budget.
+
+Usage:
+    python -m src.weight_calculator.importtime --budget 400 --forbid numpy,scipy,requests
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def measure_imports(module: str = "main", cwd: str = None) -> List[Tuple[str, float, float]]:
+    """
+    Import a module in a fresh interpreter and collect import times
+
+    Args:
+        module: name of the module to import
+        cwd: directory to run the interpreter in (defaults to the project root)
+
+    Returns:
+        List of (module name, self ms, cumulative ms) in import order
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd or str(PROJECT_ROOT),
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    timings = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name.rstrip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return timings
+
+
+def module_report(timings: List[Tuple[str, float, float]], module: str = "main") -> Dict[str, float]:
+    """
+    Cumulative import time of each package imported by the entry module, in ms
+
+    ``-X importtime`` lists modules after their own imports, indented by
+    depth, so the packages imported directly by the entry module are the
+    depth-1 lines between the previous top-level line and the entry itself.
+    """
+    report = {}
+    for name, _, cumulative in timings:
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return report
+            report = {}
+        elif depth == 1:
+            package = name.strip().split(".")[0]
+            report[package] = report.get(package, 0.0) + cumulative
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report import time of the application entry point")
+    parser.add_argument("--module", default="main", help="entry module to import")
+    parser.add_argument("--budget", type=float, default=None, help="maximum total import time in ms")
+    parser.add_argument("--forbid", default="", help="comma separated modules that must not be imported at startup")
+    parser.add_argument("--top", type=int, default=15, help="number of modules to list")
+    args = parser.parse_args(argv)
+
+    timings = measure_imports(args.module)
+    report = module_report(timings, args.module)
+    total = next(cumulative for name, _, cumulative in timings if name.strip() == args.module)
+
+    for package, ms in sorted(report.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{ms:10.1f} ms  {package}")
+    print(f"{total:10.1f} ms  total")
+
+    failed = False
+    imported = {name.strip() for name, _, _ in timings}
+    for name in filter(None, (m.strip() for m in args.forbid.split(","))):
+        if name in imported:
+            print(f"FAIL: {name} is imported at startup")
+            failed = True
+    if args.budget is not None and total > args.budget:
+        print(f"FAIL: import time {total:.1f} ms exceeds budget {args.budget:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,30 @@
-import numpy as np
-from scipy.interpolate import interp1d
-from typing import List, Tuple
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Iterator
+from typing import Any, List, Sequence, Tuple
+
+_numpy_module = False  # not imported yet
+
+
+def _numpy():
+    """Import NumPy on first use; None when it is not installed"""
+    global _numpy_module
+    if _numpy_module is False:
+        try:
+            import numpy
+        except ImportError:  # NumPy is optional for evaluating calibration models
+            numpy = None
+        _numpy_module = numpy
+    return _numpy_module
+
+
+def _as_float_array(np, x_values):
+    """Float array of x_values; iterators are consumed, scalars give a 0-d array"""
+    if isinstance(x_values, Iterator):
+        return np.fromiter(x_values, dtype=float)
+    return np.asarray(x_values, dtype=float)
+
 
 def linear_interpolation(x: float, points: List[Tuple[float, float]]) -> float:
     """
@@ -13,6 +37,8 @@ def linear_interpolation(x: float, points: List[Tuple[float, float]]) -> float:
     Returns:
         Interpolated/extrapolated weight value
     """
+    import numpy as np
+
     x_values = np.array([p[0] for p in points])
     y_values = np.array([p[1] for p in points])
 
@@ -31,15 +57,30 @@ def quadratic_interpolation(x: float, points: List[Tuple[float, float]]) -> floa
     Returns:
         Interpolated/extrapolated weight value
     """
+    import numpy as np
+
     x_values = np.array([p[0] for p in points])
     y_values = np.array([p[1] for p in points])
 
     coefficients = np.polyfit(x_values, y_values, min(len(points)-1, 3))
     return np.polyval(coefficients, x)
 
-def get_interpolation_curve(points: List[Tuple[float, float]], num_points: int = 100, extend_factor: float = 0.2) -> Tuple[np.ndarray, np.ndarray]:
+def interpolate_weights(pressures, points: List[Tuple[float, float]]) -> Any:
+    """
+    Interpolate/extrapolate weights for many pressure values at once
+
+    Args:
+        pressures: array or iterable of pressure values
+        points: list of (pressure, weight) calibration points
+
+    Returns:
+        Array of weight values, one per pressure (a list without NumPy)
+    """
+    return CalibrationModel(points).evaluate(pressures)
+
+def get_interpolation_curve(points: List[Tuple[float, float]], num_points: int = 100, extend_factor: float = 0.2) -> Tuple[Any, Any]:
     """
-    Generate points for plotting interpolation curve with extended range using cubic spline
+    Generate points for plotting interpolation curve with extended range using quadratic spline
 
     Args:
         points: list of (pressure, weight) calibration points
@@ -49,11 +90,12 @@ def get_interpolation_curve(points: List[Tuple[float, float]], num_points: int =
     Returns:
         Tuple of (x_values, y_values) for plotting
     """
+    import numpy as np
+
     if len(points) < 2:
         return np.array([]), np.array([])
 
     x_values = np.array([p[0] for p in points])
-    y_values = np.array([p[1] for p in points])
 
     x_min = min(x_values)
     x_max = max(x_values)
@@ -66,14 +108,493 @@ def get_interpolation_curve(points: List[Tuple[float, float]], num_points: int =
     # Create extended x values for smooth curve
     x_curve = np.linspace(x_extended_min, x_extended_max, num_points)
 
-    if len(points) == 2:
-        # Use linear interpolation for 2 points
-        coefficients = np.polyfit(x_values, y_values, 1)
-        y_curve = np.polyval(coefficients, x_curve)
-    else:
-        # Use cubic spline interpolation for more than 2 points
-        # k=2 for quadratic spline, k=3 for cubic spline
-        spline = interp1d(x_values, y_values, kind='quadratic', bounds_error=False, fill_value='extrapolate')
-        y_curve = spline(x_curve)
-
-    return x_curve, y_curve
\ No newline at end of file
+    # Linear for 2 points, quadratic spline for more than 2 points
+    y_curve = CalibrationModel(points).evaluate(x_curve)
+
+    return x_curve, y_curve
+
+
+class PiecewisePolynomial:
+    """
+    Piecewise polynomial evaluated with bisect and Horner's scheme.
+
+    Piece i covers [breakpoints[i], breakpoints[i+1]] and holds its
+    coefficients highest power first, in powers of (x - breakpoints[i]).
+    The first and last pieces are extended beyond the breakpoints, which
+    gives the same extrapolation as scipy's PPoly.
+    """
+
+    def __init__(self, breakpoints: Sequence[float], coefficients: Sequence[Sequence[float]]):
+        if len(coefficients) != len(breakpoints) - 1:
+            raise ValueError("Expected one coefficient row per interval")
+        self.breakpoints = [float(b) for b in breakpoints]
+        self.coefficients = [[float(c) for c in row] for row in coefficients]
+        self.degree = len(self.coefficients[0]) - 1
+        self._interior = self.breakpoints[1:-1]
+        self._arrays = None
+
+    def __call__(self, x: float) -> float:
+        """Evaluate at a single point"""
+        x = float(x)
+        i = bisect_right(self._interior, x)
+        dx = x - self.breakpoints[i]
+        result = 0.0
+        for c in self.coefficients[i]:
+            result = result * dx + c
+        return result
+
+    def evaluate(self, x_values):
+        """
+        Evaluate at many points
+
+        Returns:
+            numpy array when NumPy is installed, otherwise a list
+        """
+        np = _numpy()
+        if np is None:
+            return [self(x) for x in x_values]
+
+        x_values = _as_float_array(np, x_values)
+        if self._arrays is None:
+            self._arrays = (np.array(self._interior),
+                            np.array(self.breakpoints[:-1]),
+                            np.array(self.coefficients).T)
+        interior, starts, coefficients = self._arrays
+
+        index = np.searchsorted(interior, x_values, side='right')
+        dx = x_values - starts[index]
+        result = coefficients[0][index]
+        for row in coefficients[1:]:
+            result = result * dx + row[index]
+        return result
+
+
+def _linear_spline(x: List[float], y: List[float]) -> PiecewisePolynomial:
+    """Piecewise linear interpolant through the points"""
+    coefficients = [[(y[i + 1] - y[i]) / (x[i + 1] - x[i]), y[i]] for i in range(len(x) - 1)]
+    return PiecewisePolynomial(x, coefficients)
+
+
+def _bspline_basis(t: List[float], k: int, span: int, x: float) -> List[float]:
+    """Values of the k+1 B-splines of degree k that are nonzero on knot span `span`"""
+    basis = [1.0] + [0.0] * k
+    left = [0.0] * (k + 1)
+    right = [0.0] * (k + 1)
+    for j in range(1, k + 1):
+        left[j] = x - t[span + 1 - j]
+        right[j] = t[span + j] - x
+        saved = 0.0
+        for r in range(j):
+            temp = basis[r] / (right[r + 1] + left[j - r])
+            basis[r] = saved + right[r + 1] * temp
+            saved = left[j - r] * temp
+        basis[j] = saved
+    return basis
+
+
+def _quadratic_spline(x: List[float], y: List[float]) -> PiecewisePolynomial:
+    """
+    Quadratic interpolating spline, identical to interp1d(kind='quadratic')
+
+    Uses the same knots as scipy's make_interp_spline(k=2): the midpoints
+    between data points, without the first and last one. The collocation
+    matrix is tridiagonal and totally positive, so it is solved by
+    elimination without pivoting.
+    """
+    n = len(x)
+    k = 2
+    midpoints = [(x[i] + x[i + 1]) / 2 for i in range(1, n - 2)]
+    t = [x[0]] * (k + 1) + midpoints + [x[-1]] * (k + 1)
+
+    # Tridiagonal collocation system: row i has sub, diag, sup entries
+    sub = [0.0] * n
+    diag = [1.0] * n
+    sup = [0.0] * n
+    for i in range(1, n - 1):
+        span = i + 1
+        sub[i], diag[i], sup[i] = _bspline_basis(t, k, span, x[i])
+
+    # Thomas algorithm
+    c = list(y)
+    for i in range(1, n):
+        w = sub[i] / diag[i - 1]
+        diag[i] -= w * sup[i - 1]
+        c[i] -= w * c[i - 1]
+    c[-1] /= diag[-1]
+    for i in range(n - 2, -1, -1):
+        c[i] = (c[i] - sup[i] * c[i + 1]) / diag[i]
+
+    def spline_value(span, value):
+        basis = _bspline_basis(t, k, span, value)
+        return sum(b * c[span - k + r] for r, b in enumerate(basis))
+
+    # Convert every knot span to Taylor coefficients at its left end
+    breakpoints = [x[0]] + midpoints + [x[-1]]
+    coefficients = []
+    for span in range(k, n):
+        a, b = t[span], t[span + 1]
+        h = b - a
+        f_a = spline_value(span, a)
+        f_m = spline_value(span, a + h / 2)
+        f_b = spline_value(span, b)
+        a2 = 2 * (f_b - 2 * f_m + f_a) / (h * h)
+        a1 = (f_b - f_a) / h - a2 * h
+        coefficients.append([a2, a1, f_a])
+    return PiecewisePolynomial(breakpoints, coefficients)
+
+
+class CalibrationModel:
+    """
+    Calibration curve compiled once into piecewise polynomial coefficients.
+
+    Building the model fits the spline; evaluating it afterwards only locates
+    the interval and evaluates the precomputed polynomial, so a model should
+    be built once per calibration set and reused for every calculation.
+    Neither step needs SciPy, and NumPy is only used to evaluate arrays.
+    """
+
+    def __init__(self, points: Sequence[Tuple[float, float]], kind: str = None):
+        """
+        Args:
+            points: list of (pressure, weight) calibration points
+            kind: 'linear' or 'quadratic'; by default linear for 2 points
+                and quadratic otherwise
+        """
+        if len(points) < 2:
+            raise ValueError("At least 2 calibration points are required")
+
+        ordered = sorted((float(p[0]), float(p[1])) for p in points)
+        x_values = [p[0] for p in ordered]
+        y_values = [p[1] for p in ordered]
+        if any(x1 >= x2 for x1, x2 in zip(x_values, x_values[1:])):
+            raise ValueError("Calibration pressures must be unique")
+
+        if kind is None:
+            kind = 'linear' if len(ordered) == 2 else 'quadratic'
+        if kind == 'linear':
+            self._poly = _linear_spline(x_values, y_values)
+        elif kind == 'quadratic' and len(ordered) >= 3:
+            self._poly = _quadratic_spline(x_values, y_values)
+        else:
+            raise ValueError(f"Unsupported calibration model kind: {kind}")
+
+        self.kind = kind
+        self.x_min = x_values[0]
+        self.x_max = x_values[-1]
+
+    @classmethod
+    def from_piecewise(cls, poly: PiecewisePolynomial, kind: str, x_min: float, x_max: float) -> "CalibrationModel":
+        """Wrap an already fitted piecewise polynomial, e.g. one chosen by model selection"""
+        model = cls.__new__(cls)
+        model._poly = poly
+        model.kind = kind
+        model.x_min = float(x_min)
+        model.x_max = float(x_max)
+        return model
+
+    @property
+    def breakpoints(self) -> List[float]:
+        """Interval boundaries of the piecewise polynomial"""
+        return self._poly.breakpoints
+
+    @property
+    def coefficients(self) -> List[List[float]]:
+        """Polynomial coefficients, one row per interval"""
+        return self._poly.coefficients
+
+    def __call__(self, x: float) -> float:
+        """Evaluate the calibration curve at a single pressure value"""
+        return self._poly(x)
+
+    def evaluate(self, x_values):
+        """Evaluate the calibration curve at an array of pressure values"""
+        return self._poly.evaluate(x_values)
+
+
+def points_signature(points: Sequence[Tuple[float, float]], kind: str = None) -> str:
+    """
+    Stable fingerprint of a calibration point set, used to validate saved tables
+
+    Args:
+        points: (pressure, weight) pairs
+        kind: model the table samples; tables of different models never match
+    """
+    import hashlib
+
+    canonical = ";".join(f"{float(p):.17g},{float(w):.17g}" for p, w in sorted(points))
+    if kind is not None:
+        canonical = f"{kind}|{canonical}"
+    return hashlib.sha1(canonical.encode("ascii")).hexdigest()
+
+
+class CalibrationLUT:
+    """
+    Calibration curve sampled onto a dense uniform pressure grid.
+
+    Inside the sampled range a lookup is an O(1) index computation plus a
+    linear blend of two neighbouring samples; outside it the exact model is
+    used when available, otherwise the end segments are extended.
+    `max_error` is the largest deviation from the exact model measured when
+    the table was built.
+    """
+
+    def __init__(self, x_min: float, x_max: float, values: Sequence[float],
+                 max_error: float = None, signature: str = None, model: CalibrationModel = None):
+        if len(values) < 2:
+            raise ValueError("A lookup table needs at least 2 samples")
+        self.x_min = float(x_min)
+        self.x_max = float(x_max)
+        self.values = [float(v) for v in values]
+        self.step = (self.x_max - self.x_min) / (len(self.values) - 1)
+        self._inv_step = 1.0 / self.step
+        self.max_error = max_error
+        self.signature = signature
+        self.model = model
+        self._array = None
+
+    @classmethod
+    def build(cls, model: CalibrationModel, size: int = 4096, extend_factor: float = 0.2,
+              check_factor: int = 4, signature: str = None) -> "CalibrationLUT":
+        """
+        Sample a calibration model and measure the table's error
+
+        Args:
+            model: exact calibration model to sample
+            size: number of samples in the table
+            extend_factor: factor to extend the range beyond calibration points
+            check_factor: sub-samples per table cell used to measure the error
+            signature: points_signature of the calibration set, stored for validation
+
+        Returns:
+            Lookup table with `max_error` filled in
+        """
+        range_x = model.x_max - model.x_min
+        x_min = model.x_min - range_x * extend_factor
+        x_max = model.x_max + range_x * extend_factor
+        step = (x_max - x_min) / (size - 1)
+
+        values = model.evaluate([x_min + step * i for i in range(size)])
+        table = cls(x_min, x_max, list(values), signature=signature, model=model)
+
+        checks = [x_min + step * i / check_factor for i in range((size - 1) * check_factor + 1)]
+        exact = model.evaluate(checks)
+        approx = table.evaluate(checks)
+        table.max_error = max(abs(float(a) - float(e)) for a, e in zip(approx, exact))
+        return table
+
+    def __call__(self, x: float) -> float:
+        """Look up a single pressure value"""
+        position = (x - self.x_min) * self._inv_step
+        i = int(position)
+        if position < 0 or i >= len(self.values) - 1:
+            return self._outside(x)
+        frac = position - i
+        return self.values[i] + (self.values[i + 1] - self.values[i]) * frac
+
+    def _outside(self, x: float) -> float:
+        if x == self.x_max:
+            return self.values[-1]
+        if self.model is not None:
+            return self.model(x)
+        if x < self.x_min:
+            slope = (self.values[1] - self.values[0]) * self._inv_step
+            return self.values[0] + slope * (x - self.x_min)
+        slope = (self.values[-1] - self.values[-2]) * self._inv_step
+        return self.values[-1] + slope * (x - self.x_max)
+
+    def evaluate(self, x_values):
+        """
+        Look up many pressure values
+
+        Returns:
+            numpy array when NumPy is installed, otherwise a list
+        """
+        np = _numpy()
+        if np is None:
+            return [self(x) for x in x_values]
+
+        x_values = _as_float_array(np, x_values)
+        if x_values.ndim == 0:
+            return np.float64(self(float(x_values)))
+        if self._array is None:
+            self._array = np.array(self.values)
+
+        position = (x_values - self.x_min) * self._inv_step
+        index = np.clip(position.astype(np.int64), 0, len(self.values) - 2)
+        frac = position - index
+        result = self._array[index] + (self._array[index + 1] - self._array[index]) * frac
+
+        outside = (position < 0) | (position > len(self.values) - 1)
+        if outside.any():
+            result[outside] = [self._outside(x) for x in x_values[outside]]
+        return result
+
+    def to_dict(self) -> dict:
+        """Serializable representation (the exact model is not included)"""
+        return {
+            "x_min": self.x_min,
+            "x_max": self.x_max,
+            "values": self.values,
+            "max_error": self.max_error,
+            "signature": self.signature,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, model: CalibrationModel = None) -> "CalibrationLUT":
+        """Restore a table saved with to_dict"""
+        return cls(data["x_min"], data["x_max"], data["values"],
+                   max_error=data.get("max_error"), signature=data.get("signature"), model=model)
+
+
+class IncrementalPolyFit:
+    """
+    Least-squares polynomial fit kept up to date from running power sums.
+
+    Gives the same fit as quadratic_interpolation (degree min(n-1, 3)), but
+    adding, editing or removing a point only updates the sums of t^k and
+    t^k*y instead of refitting every point. Pressures are shifted and scaled
+    to t = (x - center) / scale so the sums stay well conditioned for large
+    pressure values; when points drift far from that window, or after many
+    removals, the sums are recomputed from the stored points.
+    """
+
+    def __init__(self, points: Sequence[Tuple[float, float]] = (), max_degree: int = 3):
+        self.max_degree = max_degree
+        self._points = {}
+        self._count = 0
+        for x, y in points:
+            key = (float(x), float(y))
+            self._points[key] = self._points.get(key, 0) + 1
+            self._count += 1
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def degree(self) -> int:
+        """Degree the fit aims for; lower when the points cannot support it"""
+        return max(0, min(self._count - 1, self.max_degree))
+
+    def _rebuild(self):
+        """Recompute normalization and power sums from the stored points"""
+        xs = [x for x, _ in self._points]
+        if xs:
+            lo, hi = min(xs), max(xs)
+            self._center = (lo + hi) / 2
+            self._scale = (hi - lo) / 2 or 1.0
+        else:
+            self._center, self._scale = 0.0, 1.0
+        self._t_sums = [0.0] * (2 * self.max_degree + 1)
+        self._ty_sums = [0.0] * (self.max_degree + 1)
+        self._removals = 0
+        for (x, y), count in self._points.items():
+            self._accumulate(x, y, count)
+        self._coefficients = None
+        self._fresh = True
+
+    def _accumulate(self, x: float, y: float, weight: int):
+        t = (x - self._center) / self._scale
+        power = float(weight)
+        for k in range(len(self._t_sums)):
+            self._t_sums[k] += power
+            if k < len(self._ty_sums):
+                self._ty_sums[k] += power * y
+            power *= t
+        self._coefficients = None
+        self._fresh = False
+
+    def add(self, x: float, y: float):
+        """Add a calibration point"""
+        key = (float(x), float(y))
+        self._points[key] = self._points.get(key, 0) + 1
+        self._count += 1
+        if abs(key[0] - self._center) > 4 * self._scale:
+            self._rebuild()
+        else:
+            self._accumulate(key[0], key[1], 1)
+
+    def remove(self, x: float, y: float):
+        """Remove a calibration point previously added"""
+        key = (float(x), float(y))
+        if key not in self._points:
+            raise KeyError(f"Calibration point {key} is not part of the fit")
+        self._points[key] -= 1
+        if not self._points[key]:
+            del self._points[key]
+        self._count -= 1
+        self._removals += 1
+        # Subtracting sums cancels digits; start over once removals pile up
+        if self._removals > max(16, self._count):
+            self._rebuild()
+        else:
+            self._accumulate(key[0], key[1], -1)
+
+    def replace(self, old: Tuple[float, float], new: Tuple[float, float]):
+        """Edit a calibration point"""
+        self.remove(*old)
+        self.add(*new)
+
+    def coefficients(self) -> List[float]:
+        """Fit coefficients in powers of t, highest power first"""
+        if self._coefficients is None:
+            if self._count == 0:
+                raise ValueError("No calibration points to fit")
+            try:
+                self._coefficients = self._solve(self.degree)
+            except ValueError:
+                if not self._fresh:
+                    # The normalization window no longer fits the points
+                    self._rebuild()
+                self._coefficients = self._solve_reduced()
+        return self._coefficients
+
+    def _solve_reduced(self) -> List[float]:
+        """
+        Fit the highest degree the points support
+
+        Repeated pressures, or a far outlier that leaves the other points
+        bunched together, give fewer distinct pressures than the degree
+        needs; a lower-degree least-squares fit is used then.
+        """
+        for degree in range(self.degree, -1, -1):
+            try:
+                return self._solve(degree)
+            except ValueError:
+                continue
+        raise ValueError("Calibration points cannot be fitted")
+
+    def _solve(self, degree: int) -> List[float]:
+        size = degree + 1
+        # Normal equations: Hankel matrix of power sums
+        matrix = [[self._t_sums[i + j] for j in range(size)] + [self._ty_sums[i]] for i in range(size)]
+        for col in range(size):
+            pivot = max(range(col, size), key=lambda r: abs(matrix[r][col]))
+            if abs(matrix[pivot][col]) < 1e-12 * self._t_sums[0]:
+                raise ValueError(f"Calibration points do not determine a degree-{degree} fit")
+            matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+            for row in range(col + 1, size):
+                factor = matrix[row][col] / matrix[col][col]
+                for j in range(col, size + 1):
+                    matrix[row][j] -= factor * matrix[col][j]
+        solution = [0.0] * size
+        for row in range(size - 1, -1, -1):
+            total = matrix[row][size] - sum(matrix[row][j] * solution[j] for j in range(row + 1, size))
+            solution[row] = total / matrix[row][row]
+        return solution[::-1]
+
+    def __call__(self, x: float) -> float:
+        """Evaluate the fit at a single pressure value"""
+        t = (float(x) - self._center) / self._scale
+        result = 0.0
+        for c in self.coefficients():
+            result = result * t + c
+        return result
+
+    def evaluate(self, x_values):
+        """Evaluate the fit at many pressure values"""
+        np = _numpy()
+        if np is None:
+            return [self(x) for x in x_values]
+        x_values = _as_float_array(np, x_values)
+        return np.polyval(self.coefficients(), (x_values - self._center) / self._scale)
@@ -0,0 +1,186 @@
+"""
+Offline IPv4 range to location database
+
+The file holds sorted range starts, range ends and location indexes as
+little-endian uint32 arrays, followed by the location names. It is
+memory-mapped and searched in place with bisect, so opening it parses
+nothing and a lookup touches a handful of pages.
+
+Layout:
+    header      magic, version, range count, name count (20 bytes)
+    starts      uint32[ranges]
+    ends        uint32[ranges]
+    locations   uint32[ranges], index into names
+    offsets     uint32[names + 1], byte offsets into the name blob
+    blob        UTF-8 names
+
+Usage:
+    python -m src.weight_calculator.ipdb build ranges.csv ip_locations.bin
+    python -m src.weight_calculator.ipdb lookup ip_locations.bin 8.8.8.8
+
+The CSV has one range per row: start IP and end IP, or a CIDR block and an
+empty second column, then the location name.
+"""
+import argparse
+import array
+import csv
+import ipaddress
+import mmap
+import os
+import socket
+import struct
+import sys
+from bisect import bisect_right
+from typing import List, Optional
+
+from .database import SharedInstances
+
+MAGIC = b"WCIPDB\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIII")
+_IPV4 = struct.Struct("!I")
+
+
+def _uint32_array(buffer, offset: int, count: int):
+    """uint32 view of a little-endian array, without copying where the CPU allows"""
+    view = memoryview(buffer)[offset:offset + 4 * count]
+    if sys.byteorder == "little":
+        return view.cast("I")
+    values = array.array("I", view)
+    values.byteswap()
+    return values
+
+
+class IPDatabase(SharedInstances):
+    """Memory-mapped IPv4 range database"""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, ranges, names = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not an IP location database: {path}")
+
+        offset = HEADER.size
+        self._starts = _uint32_array(self._map, offset, ranges)
+        offset += 4 * ranges
+        self._ends = _uint32_array(self._map, offset, ranges)
+        offset += 4 * ranges
+        self._locations = _uint32_array(self._map, offset, ranges)
+        offset += 4 * ranges
+        self._offsets = _uint32_array(self._map, offset, names + 1)
+        self._blob = offset + 4 * (names + 1)
+
+    @classmethod
+    def shared(cls, path: str) -> "IPDatabase":
+        """Get the mapping shared by all sessions for a file"""
+        key = os.path.abspath(path)
+        return cls._shared(key, lambda: cls(key))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """
+        Find the location of an IPv4 address
+
+        Returns:
+            Location name, or None for unknown, IPv6 or malformed addresses
+        """
+        try:
+            value = _IPV4.unpack(socket.inet_pton(socket.AF_INET, ip))[0]
+        except (OSError, TypeError):
+            return None
+        index = bisect_right(self._starts, value) - 1
+        if index < 0 or value > self._ends[index]:
+            return None
+        name = self._locations[index]
+        start, end = self._offsets[name], self._offsets[name + 1]
+        return self._map[self._blob + start:self._blob + end].decode("utf-8")
+
+
+def _parse_range(first: str, second: str):
+    if not second:
+        network = ipaddress.IPv4Network(first.strip(), strict=False)
+        return int(network.network_address), int(network.broadcast_address)
+    return int(ipaddress.IPv4Address(first.strip())), int(ipaddress.IPv4Address(second.strip()))
+
+
+def build_ip_database(source: str, path: str) -> int:
+    """
+    Build a database file from a CSV of ranges
+
+    Args:
+        source: CSV with rows of (start IP, end IP, location) or (CIDR, '', location)
+        path: output file
+
+    Returns:
+        Number of ranges written
+    """
+    ranges = []
+    names = {}
+    with open(source, newline="", encoding="utf-8-sig") as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            if not row or row[0].startswith("#"):
+                continue
+            try:
+                start, end = _parse_range(row[0], row[1] if len(row) > 1 else "")
+            except ValueError:
+                if line == 1:
+                    continue  # header
+                raise ValueError(f"line {line}: invalid range {row[:2]}")
+            if end < start:
+                raise ValueError(f"line {line}: range ends before it starts")
+            name = row[2].strip() if len(row) > 2 else ""
+            ranges.append((start, end, names.setdefault(name, len(names))))
+
+    ranges.sort()
+    for previous, current in zip(ranges, ranges[1:]):
+        if current[0] <= previous[1]:
+            raise ValueError(f"Overlapping ranges at {ipaddress.IPv4Address(current[0])}")
+
+    blob = bytearray()
+    offsets = array.array("I", [0])
+    for name in names:
+        blob += name.encode("utf-8")
+        offsets.append(len(blob))
+    columns = [array.array("I", (r[i] for r in ranges)) for i in range(3)] + [offsets]
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(ranges), len(names)))
+        for column in columns:
+            f.write(column.tobytes())
+        f.write(blob)
+    return len(ranges)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or query an offline IP location database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a database from a CSV of ranges")
+    build.add_argument("source")
+    build.add_argument("path")
+    lookup = commands.add_parser("lookup", help="look up addresses")
+    lookup.add_argument("path")
+    lookup.add_argument("ips", nargs="+")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "build":
+            print(f"{build_ip_database(args.source, args.path)} ranges written")
+        else:
+            database = IPDatabase(args.path)
+            for ip in args.ips:
+                print(f"{ip}: {database.lookup(ip)}")
+    except (OSError, ValueError) as e:
+        print(f"Ошибка базы IP-адресов: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Automatic choice of the calibration curve
+
+Candidates are scored by leave-one-out (LOO) error: how well the curve
+fitted without a point predicts that point. For least-squares polynomials
+and the smoothing spline the LOO residuals come from the hat matrix,
+e_i / (1 - h_ii), so no candidate is refitted n times. PCHIP is local, so
+its LOO prediction for a point only needs the few neighbouring points.
+"""
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from .interpolation import CalibrationModel, PiecewisePolynomial, points_signature
+
+CANDIDATES = ("linear", "quadratic", "cubic", "pchip", "smoothing_spline")
+
+# Scores closer than this, relative to the best score or the weight span,
+# are rounding noise and count as a tie
+_TIE_TOLERANCE = 1e-9
+
+_CACHE_SIZE = 32
+_cache = OrderedDict()
+
+
+class ModelSelection(NamedTuple):
+    kind: str
+    model: CalibrationModel
+    scores: Dict[str, float]
+
+
+def _polynomial(x: np.ndarray, y: np.ndarray, degree: int) -> Tuple[PiecewisePolynomial, float]:
+    """Least-squares polynomial and its LOO RMSE from the hat matrix diagonal"""
+    scale = x[-1] - x[0]
+    vander = np.vander((x - x[0]) / scale, degree + 1, increasing=True)
+    q, r = np.linalg.qr(vander)
+    qty = q.T @ y
+    residuals = y - q @ qty
+    leverage = np.sum(q * q, axis=1)
+    loo = residuals / (1 - leverage)
+
+    beta = np.linalg.solve(r, qty) / scale ** np.arange(degree + 1)
+    poly = PiecewisePolynomial([x[0], x[-1]], [beta[::-1].tolist()])
+    return poly, float(np.sqrt(np.mean(loo ** 2)))
+
+
+def _pchip_edge(h0: float, h1: float, m0: float, m1: float) -> float:
+    d = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+    if np.sign(d) != np.sign(m0):
+        return 0.0
+    if np.sign(m0) != np.sign(m1) and abs(d) > abs(3 * m0):
+        return 3 * m0
+    return d
+
+
+def _pchip(x: Sequence[float], y: Sequence[float]) -> PiecewisePolynomial:
+    """Shape-preserving cubic Hermite interpolant, same slopes as scipy's PchipInterpolator"""
+    n = len(x)
+    h = [x[i + 1] - x[i] for i in range(n - 1)]
+    m = [(y[i + 1] - y[i]) / h[i] for i in range(n - 1)]
+
+    if n == 2:
+        slopes = [m[0], m[0]]
+    else:
+        slopes = [0.0] * n
+        for i in range(1, n - 1):
+            if m[i - 1] * m[i] > 0:
+                w1 = 2 * h[i] + h[i - 1]
+                w2 = h[i] + 2 * h[i - 1]
+                slopes[i] = (w1 + w2) / (w1 / m[i - 1] + w2 / m[i])
+        slopes[0] = _pchip_edge(h[0], h[1], m[0], m[1])
+        slopes[-1] = _pchip_edge(h[-1], h[-2], m[-1], m[-2])
+
+    coefficients = []
+    for i in range(n - 1):
+        d0, d1 = slopes[i], slopes[i + 1]
+        c2 = (3 * m[i] - 2 * d0 - d1) / h[i]
+        c3 = (d0 + d1 - 2 * m[i]) / (h[i] * h[i])
+        coefficients.append([c3, c2, d0, y[i]])
+    return PiecewisePolynomial(list(x), coefficients)
+
+
+def _pchip_loo(x: Sequence[float], y: Sequence[float]) -> float:
+    """LOO RMSE of PCHIP; slopes only depend on neighbours, so 3 points per side suffice"""
+    errors = []
+    for i in range(len(x)):
+        nearby = list(range(max(0, i - 3), i)) + list(range(i + 1, min(len(x), i + 4)))
+        curve = _pchip([x[j] for j in nearby], [y[j] for j in nearby])
+        errors.append(curve(x[i]) - y[i])
+    return float(np.sqrt(np.mean(np.square(errors))))
+
+
+def _natural_spline(x: np.ndarray, values: np.ndarray, second: np.ndarray) -> PiecewisePolynomial:
+    """Natural cubic spline from knot values and second derivatives, extrapolated linearly"""
+    h = np.diff(x)
+    slope = np.diff(values) / h - h * (2 * second[:-1] + second[1:]) / 6
+    coefficients = [[(second[i + 1] - second[i]) / (6 * h[i]), second[i] / 2, slope[i], values[i]]
+                    for i in range(len(h))]
+
+    end_slope = slope[-1] + h[-1] * (second[-2] + second[-1]) / 2
+    span = x[-1] - x[0]
+    # Natural splines continue as straight lines outside the knots
+    start_value = values[0] - slope[0] * span
+    coefficients = [[0.0, 0.0, slope[0], start_value]] + coefficients + [[0.0, 0.0, end_slope, values[-1]]]
+    breakpoints = [x[0] - span] + x.tolist() + [x[-1] + span]
+    return PiecewisePolynomial(breakpoints, coefficients)
+
+
+def _smoothing_spline(x: np.ndarray, y: np.ndarray) -> Tuple[PiecewisePolynomial, float]:
+    """
+    Cubic smoothing spline with the penalty chosen by closed-form LOO
+
+    Uses the Reinsch form: fitted values are S(lam) y with
+    S(lam) = (I + lam K)^-1 and K = Q R^-1 Q^T. One eigendecomposition of K
+    gives S and its diagonal for every lam on the grid.
+    """
+    n = len(x)
+    h = np.diff(x)
+    q = np.zeros((n, n - 2))
+    r = np.zeros((n - 2, n - 2))
+    for j in range(n - 2):
+        q[j, j] = 1 / h[j]
+        q[j + 1, j] = -1 / h[j] - 1 / h[j + 1]
+        q[j + 2, j] = 1 / h[j + 1]
+        r[j, j] = (h[j] + h[j + 1]) / 3
+        if j + 1 < n - 2:
+            r[j, j + 1] = r[j + 1, j] = h[j + 1] / 6
+
+    k = q @ np.linalg.solve(r, q.T)
+    eigenvalues, vectors = np.linalg.eigh((k + k.T) / 2)
+    eigenvalues = np.clip(eigenvalues, 0, None)
+    vty = vectors.T @ y
+    squared = vectors * vectors
+    typical = np.median(eigenvalues[eigenvalues > 0]) if np.any(eigenvalues > 0) else 1.0
+
+    best = None
+    for lam in np.logspace(-4, 6, 41) / typical:
+        shrink = 1 / (1 + lam * eigenvalues)
+        leverage = squared @ shrink
+        if np.any(leverage > 1 - 1e-9):
+            continue
+        fitted = vectors @ (shrink * vty)
+        score = float(np.sqrt(np.mean(((y - fitted) / (1 - leverage)) ** 2)))
+        if best is None or score < best[0]:
+            best = (score, fitted)
+
+    if best is None:
+        raise ValueError("Smoothing spline penalty could not be selected")
+    score, fitted = best
+    second = np.zeros(n)
+    second[1:-1] = np.linalg.solve(r, q.T @ fitted)
+    return _natural_spline(x, fitted, second), score
+
+
+def select_model(points: Sequence[Tuple[float, float]], candidates: Sequence[str] = CANDIDATES) -> ModelSelection:
+    """
+    Pick the calibration curve with the lowest leave-one-out error
+
+    Results are cached per calibration point set, so calling this on every
+    calibration edit only scores each distinct set once.
+
+    Args:
+        points: list of (pressure, weight) calibration points
+        candidates: model kinds to consider
+
+    Returns:
+        ModelSelection with the winning kind, its model and the LOO RMSE of every candidate scored
+    """
+    key = (points_signature(points), tuple(candidates))
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    ordered = sorted((float(p[0]), float(p[1])) for p in points)
+    x = np.array([p[0] for p in ordered])
+    y = np.array([p[1] for p in ordered])
+    if len(x) < 3:
+        raise ValueError("At least 3 calibration points are required for model selection")
+    if np.any(np.diff(x) <= 0):
+        raise ValueError("Calibration pressures must be unique")
+
+    fitted: Dict[str, Tuple[PiecewisePolynomial, float]] = {}
+    degrees = {"linear": 1, "quadratic": 2, "cubic": 3}
+    for kind in candidates:
+        if kind in degrees:
+            # LOO needs at least one point more than the polynomial has coefficients
+            if len(x) > degrees[kind] + 1:
+                fitted[kind] = _polynomial(x, y, degrees[kind])
+        elif kind == "pchip":
+            fitted[kind] = (_pchip(x.tolist(), y.tolist()), _pchip_loo(x.tolist(), y.tolist()))
+        elif kind == "smoothing_spline":
+            if len(x) >= 4:
+                fitted[kind] = _smoothing_spline(x, y)
+        else:
+            raise ValueError(f"Unknown calibration model kind: {kind}")
+
+    # Candidates are ordered simple to complex; a tie keeps the simpler one
+    span = float(np.ptp(y))
+    kind = None
+    for name, (_, score) in fitted.items():
+        if kind is None or score < fitted[kind][1] - _TIE_TOLERANCE * max(fitted[kind][1], span):
+            kind = name
+    model = CalibrationModel.from_piecewise(fitted[kind][0], kind, x[0], x[-1])
+    selection = ModelSelection(kind, model, {name: score for name, (_, score) in fitted.items()})
+
+    _cache[key] = selection
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return selection
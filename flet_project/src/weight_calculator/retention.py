@@ -0,0 +1,184 @@
+"""
+Retention policy for the calculation history
+
+Rows older than the retention period are rolled up into
+weight_history_daily (count, min, max and total weight per day and
+location) and then deleted. Work is done in small transactions with a
+pause in between, so the writer lock is never held for long, and the freed
+pages are returned to the file system with incremental vacuum.
+"""
+import time
+from typing import List, Optional, Tuple
+
+from .database import ConnectionManager
+from .locations import LOCATION_JOIN, LOCATION_NAME
+
+ROLLUP_SCHEMA = """CREATE TABLE IF NOT EXISTS weight_history_daily
+                   (day TEXT NOT NULL,
+                    location TEXT NOT NULL DEFAULT '',
+                    count INTEGER NOT NULL,
+                    min_weight REAL NOT NULL,
+                    max_weight REAL NOT NULL,
+                    total_weight REAL NOT NULL,
+                    PRIMARY KEY (day, location))"""
+
+# Oldest rows first; rows with ts = 0 are not migrated yet and have no usable date
+_EXPIRED_IDS = """SELECT id FROM weight_history
+                  WHERE ts > 0 AND ts < ?
+                  ORDER BY ts, id LIMIT ?"""
+
+# Totals are merged rather than averaged, so a day split across runs stays exact
+_ROLL_UP = f"""INSERT INTO weight_history_daily
+                   (day, location, count, min_weight, max_weight, total_weight)
+               SELECT date(h.ts, 'unixepoch', 'localtime'), COALESCE({LOCATION_NAME}, ''),
+                      COUNT(*), MIN(h.weight), MAX(h.weight), SUM(h.weight)
+               FROM weight_history h {LOCATION_JOIN}
+               WHERE h.id IN ({_EXPIRED_IDS})
+               GROUP BY 1, 2
+               ON CONFLICT (day, location) DO UPDATE SET
+                   count = count + excluded.count,
+                   min_weight = MIN(min_weight, excluded.min_weight),
+                   max_weight = MAX(max_weight, excluded.max_weight),
+                   total_weight = total_weight + excluded.total_weight"""
+
+_PRUNE = f"DELETE FROM weight_history WHERE id IN ({_EXPIRED_IDS})"
+
+
+def create_rollup_table(conn):
+    """Create the daily aggregate table if it does not exist"""
+    conn.execute(ROLLUP_SCHEMA)
+
+
+def roll_up_history(manager: ConnectionManager, days: int, batch_size: int = 500,
+                    pause: float = 0.01, now: Optional[float] = None) -> int:
+    """
+    Move history rows older than a number of days into the daily aggregates
+
+    Each batch is aggregated and deleted in the same transaction, so a row
+    is never counted twice or lost if the process stops midway.
+
+    Args:
+        manager: connection manager of the database
+        days: retention period in days
+        batch_size: rows per transaction
+        pause: seconds to sleep between transactions
+        now: current epoch time (defaults to the clock)
+
+    Returns:
+        Number of rows rolled up
+    """
+    cutoff = int((now if now is not None else time.time()) - days * 86400)
+    with manager.writer() as conn:
+        create_rollup_table(conn)
+
+    total = 0
+    while True:
+        with manager.writer() as conn:
+            conn.execute(_ROLL_UP, (cutoff, batch_size))
+            pruned = conn.execute(_PRUNE, (cutoff, batch_size)).rowcount
+        total += pruned
+        if pruned < batch_size:
+            return total
+        time.sleep(pause)
+
+
+def enable_incremental_vacuum(manager: ConnectionManager, max_pages: int = 1024) -> bool:
+    """
+    Switch the database to auto_vacuum = INCREMENTAL
+
+    A database created without it needs one full VACUUM to convert. VACUUM
+    copies every page in use while holding the writer, so the conversion is
+    only done when at most max_pages are in use, e.g. right after the
+    history is cleared; otherwise it is left for a later call.
+
+    Args:
+        manager: connection manager of the database
+        max_pages: largest number of pages in use that may be copied
+
+    Returns:
+        True if the database uses incremental vacuum afterwards
+    """
+    with manager.writer() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return True
+        used = (conn.execute("PRAGMA page_count").fetchone()[0]
+                - conn.execute("PRAGMA freelist_count").fetchone()[0])
+        if used > max_pages:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def reclaim_space(manager: ConnectionManager, pages: int = 256, pause: float = 0.01) -> int:
+    """
+    Release free pages to the file system a few at a time
+
+    Does nothing unless the database uses auto_vacuum = INCREMENTAL.
+
+    Returns:
+        Number of pages released
+    """
+    total = 0
+    while True:
+        with manager.writer() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return total
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free == 0:
+                return total
+            # The pragma frees one page per step and sqlite3's execute() steps
+            # a column-less statement only once; executescript runs it to the end
+            conn.executescript(f"PRAGMA incremental_vacuum({min(pages, free)})")
+        total += min(pages, free)
+        time.sleep(pause)
+
+
+def shrink_file(manager: ConnectionManager, pause: float = 0.01) -> int:
+    """
+    Convert the database to incremental vacuum if that is cheap, then release free pages
+
+    Returns:
+        Number of pages released
+    """
+    if not enable_incremental_vacuum(manager):
+        return 0
+    return reclaim_space(manager, pause=pause)
+
+
+def apply_retention(manager: ConnectionManager, days: int, batch_size: int = 500,
+                    pause: float = 0.01) -> Tuple[int, int]:
+    """
+    Roll up and prune expired history, then shrink the file
+
+    Returns:
+        Tuple of (rows rolled up, pages released)
+    """
+    rolled = roll_up_history(manager, days, batch_size, pause)
+    freed = shrink_file(manager, pause) if rolled else 0
+    return rolled, freed
+
+
+def get_daily_summary(manager: ConnectionManager, start: Optional[str] = None,
+                      end: Optional[str] = None) -> List[Tuple[str, str, int, float, float, float]]:
+    """
+    Get rolled-up history
+
+    Args:
+        manager: connection manager of the database
+        start: first day included, YYYY-MM-DD
+        end: first day excluded, YYYY-MM-DD
+
+    Returns:
+        List of (day, location, count, min weight, max weight, mean weight)
+    """
+    with manager.reader() as conn:
+        exists = conn.execute("""SELECT 1 FROM sqlite_master
+                                 WHERE type = 'table' AND name = 'weight_history_daily'""").fetchone()
+        if exists is None:
+            return []
+        return conn.execute("""SELECT day, location, count, min_weight, max_weight, total_weight / count
+                               FROM weight_history_daily
+                               WHERE day >= ? AND day < ?
+                               ORDER BY day, location""",
+                            (start or "", end or "9999-12-31")).fetchall()
@@ -13,6 +13,12 @@ import sqlite3
 import os
 
 class WeightCalculatorApp(App):
+    # Calibration points are cached and only re-read when PRAGMA data_version
+    # shows that another connection committed
+    _points_conn = None
+    _points_version = None
+    _points = None
+
     def build(self):
         # Настройка окна для Android
         if platform == 'android':
@@ -122,6 +128,23 @@ class WeightCalculatorApp(App):
             return app_storage_path()
         return os.path.dirname(os.path.abspath(__file__))
 
+    def get_points(self):
+        """Get calibration points, re-reading them only after the database changed"""
+        if self._points_conn is None:
+            db_path = os.path.join(self.get_application_path(), 'calibration.db')
+            self._points_conn = sqlite3.connect(db_path)
+            self._points_conn.execute('''CREATE TABLE IF NOT EXISTS calibration_points
+                                        (pressure REAL, weight REAL)''')
+            self._points_conn.commit()
+
+        version = self._points_conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._points is None or version != self._points_version:
+            c = self._points_conn.cursor()
+            c.execute("SELECT * FROM calibration_points ORDER BY pressure")
+            self._points = c.fetchall()
+            self._points_version = version
+        return self._points
+
     def add_point(self, instance):
         try:
             pressure = float(self.pressure_input.text)
@@ -155,13 +178,8 @@ class WeightCalculatorApp(App):
         try:
             pressure = float(self.calc_input.text)
 
-            # Get calibration points from database
-            db_path = os.path.join(self.get_application_path(), 'calibration.db')
-            conn = sqlite3.connect(db_path)
-            c = conn.cursor()
-            c.execute("SELECT * FROM calibration_points ORDER BY pressure")
-            points = c.fetchall()
-            conn.close()
+            # Get calibration points from cache
+            points = self.get_points()
 
             if len(points) < 2:
                 self.result_label.text = 'Нужно минимум 2 точки калибровки'
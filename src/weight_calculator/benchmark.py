@@ -0,0 +1,95 @@
+"""
+Storage profile benchmark
+
+Measures, for every profile in STORAGE_PROFILES, how many history rows per
+second can be saved with one commit each (the immediate save path), with
+group commit (the write-behind path), and how many 30-row history pages
+per second can be read by keyset cursor.
+
+Usage:
+    python -m src.weight_calculator.benchmark --rows 2000 --pages 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .database import STORAGE_PROFILES, ConnectionManager
+from .locations import HISTORY_INSERT, LOCATION_JOIN, LOCATION_NAME, create_locations_table, intern_location
+
+SCHEMA = """CREATE TABLE weight_history
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+             date TEXT NOT NULL DEFAULT '',
+             pressure REAL NOT NULL,
+             weight REAL NOT NULL,
+             location TEXT,
+             ts INTEGER NOT NULL DEFAULT 0,
+             location_id INTEGER REFERENCES locations (id))"""
+INDEX = "CREATE INDEX idx_weight_history_ts_id ON weight_history (ts, id)"
+INSERT = HISTORY_INSERT
+PAGE = f"""SELECT h.ts, h.pressure, h.weight, {LOCATION_NAME}, h.id FROM weight_history h {LOCATION_JOIN}
+          WHERE (h.ts, h.id) < (?, ?) ORDER BY h.ts DESC, h.id DESC LIMIT 30"""
+
+
+def benchmark_profile(profile: str, rows: int, pages: int, directory: str) -> Dict[str, float]:
+    """
+    Run the benchmark for one storage profile on a fresh database
+
+    Returns:
+        Dict with single-commit writes/s, group-commit writes/s and pages/s
+    """
+    path = os.path.join(directory, f"bench_{profile}.db")
+    manager = ConnectionManager(path, profile)
+    with manager.writer() as conn:
+        create_locations_table(conn)
+        conn.execute(SCHEMA)
+        conn.execute(INDEX)
+        intern_location(conn, "City, Region, Country")
+
+    started = time.perf_counter()
+    for i in range(rows):
+        with manager.writer() as conn:
+            conn.execute(INSERT, (1_700_000_000 + i, i * 0.5, i * 1.5, "City, Region, Country"))
+    single = rows / (time.perf_counter() - started)
+
+    batch = [(1_700_000_000 + rows + i, i * 0.5, i * 1.5, "City, Region, Country") for i in range(rows)]
+    started = time.perf_counter()
+    for offset in range(0, rows, 100):
+        with manager.writer() as conn:
+            conn.executemany(INSERT, batch[offset:offset + 100])
+    grouped = rows / (time.perf_counter() - started)
+
+    with manager.reader() as conn:
+        max_id = conn.execute("SELECT MAX(id) FROM weight_history").fetchone()[0]
+        keys = dict(conn.execute("SELECT id, ts FROM weight_history"))
+        rng = random.Random(0)
+        started = time.perf_counter()
+        for _ in range(pages):
+            row_id = rng.randint(31, max_id)
+            conn.execute(PAGE, (keys[row_id], row_id)).fetchall()
+        page_rate = pages / (time.perf_counter() - started)
+
+    manager.close()
+    return {"single": single, "grouped": grouped, "pages": page_rate}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark SQLite storage profiles")
+    parser.add_argument("--rows", type=int, default=2000, help="history rows written per mode")
+    parser.add_argument("--pages", type=int, default=2000, help="history pages read")
+    parser.add_argument("--dir", default=None, help="directory for the benchmark databases")
+    args = parser.parse_args(argv)
+
+    print(f"{'profile':<12} {'writes/s':>12} {'batched/s':>12} {'pages/s':>12}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for profile in STORAGE_PROFILES:
+            result = benchmark_profile(profile, args.rows, args.pages, directory)
+            print(f"{profile:<12} {result['single']:>12.0f} {result['grouped']:>12.0f} {result['pages']:>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Streaming export of the calculation history
+
+Rows are read with fetchmany in fixed-size chunks and written as they
+arrive, so a full-year export uses the same memory as a single page. The
+date range is applied to the indexed ts column, so only the requested rows
+are visited.
+
+Usage:
+    python -m src.weight_calculator.exporter history-2024.csv.gz --start 2024-01-01 --end 2025-01-01
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+from .database import ConnectionManager
+from .locations import LOCATION_JOIN, LOCATION_NAME
+
+FORMATS = ("csv", "csv.gz", "jsonl")
+COLUMNS = ("id", "date", "pressure", "weight", "location")
+
+EXPORT_COLUMNS = f"""SELECT h.id,
+                            CASE WHEN h.ts > 0 THEN strftime('%Y-%m-%d %H:%M:%S', h.ts, 'unixepoch', 'localtime')
+                                 ELSE h.date END,
+                            h.pressure, h.weight, {LOCATION_NAME}
+                     FROM weight_history h {LOCATION_JOIN}"""
+
+EXPORT_QUERY = f"""{EXPORT_COLUMNS}
+                  WHERE h.ts >= ? AND h.ts < ?
+                  ORDER BY h.ts, h.id"""
+
+# Served by the (location_id, ts) index
+EXPORT_LOCATION_QUERY = f"""{EXPORT_COLUMNS}
+                           WHERE h.location_id = (SELECT id FROM locations WHERE name = ?)
+                             AND h.ts >= ? AND h.ts < ?
+                           ORDER BY h.ts, h.id"""
+
+
+def _timestamp(value: Union[None, int, float, str, datetime], default: int) -> int:
+    """Epoch seconds from a datetime, epoch number or ISO date string"""
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def format_for(path: str) -> str:
+    """Export format implied by a file name"""
+    name = str(path).lower()
+    if name.endswith(".csv.gz"):
+        return "csv.gz"
+    if name.endswith(".jsonl") or name.endswith(".ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+def _open_text(destination, fmt: str):
+    """
+    Text stream for the destination
+
+    Returns:
+        Tuple of (text stream, finish); finish closes what this function
+        opened and leaves a caller's stream open
+    """
+    if isinstance(destination, (str, Path)):
+        if fmt == "csv.gz":
+            stream = gzip.open(destination, "wt", encoding="utf-8", newline="")
+        else:
+            stream = open(destination, "w", encoding="utf-8", newline="")
+        return stream, stream.close
+
+    if fmt == "csv.gz":
+        compressed = gzip.GzipFile(fileobj=destination, mode="wb")
+        stream = io.TextIOWrapper(compressed, encoding="utf-8", newline="")
+
+        def finish():
+            stream.flush()
+            stream.detach()
+            compressed.close()
+        return stream, finish
+
+    if isinstance(destination, io.TextIOBase) or hasattr(destination, "encoding"):
+        return destination, destination.flush
+    stream = io.TextIOWrapper(destination, encoding="utf-8", newline="")
+
+    def finish():
+        stream.flush()
+        stream.detach()
+    return stream, finish
+
+
+def export_history(manager: ConnectionManager, destination, fmt: Optional[str] = None,
+                   start=None, end=None, location: Optional[str] = None, chunk_size: int = 1000) -> int:
+    """
+    Write weight_history rows to a file or stream
+
+    Args:
+        manager: connection manager of the source database
+        destination: file path, or a text or binary stream
+        fmt: 'csv', 'csv.gz' or 'jsonl'; taken from the file name when omitted
+        start: first moment included (datetime, epoch seconds or ISO string)
+        end: first moment excluded
+        location: only rows of this location name
+        chunk_size: rows fetched from the cursor at a time
+
+    Returns:
+        Number of rows written
+    """
+    fmt = fmt or (format_for(destination) if isinstance(destination, (str, Path)) else "csv")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    # Rows saved before the ts migration have ts = 0 and are only included without a start
+    bounds = (_timestamp(start, 0), _timestamp(end, 2 ** 63 - 1))
+
+    stream, finish = _open_text(destination, fmt)
+    written = 0
+    try:
+        if fmt == "jsonl":
+            write_rows = lambda rows: stream.writelines(
+                json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+        else:
+            writer = csv.writer(stream)
+            writer.writerow(COLUMNS)
+            write_rows = writer.writerows
+
+        with manager.reader() as conn:
+            # A single statement reads one consistent snapshot even while saves continue
+            if location is None:
+                cursor = conn.execute(EXPORT_QUERY, bounds)
+            else:
+                cursor = conn.execute(EXPORT_LOCATION_QUERY, (location, *bounds))
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    write_rows(rows)
+                    written += len(rows)
+            finally:
+                cursor.close()
+    finally:
+        finish()
+    return written
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export calculation history")
+    parser.add_argument("path", help="output file (.csv, .csv.gz or .jsonl); - for standard output")
+    parser.add_argument("--db", default=str(Path.home() / "calibration.db"), help="database file")
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--start", default=None, help="first date included, ISO format")
+    parser.add_argument("--end", default=None, help="first date excluded, ISO format")
+    parser.add_argument("--location", default=None, help="only rows of this location")
+    args = parser.parse_args(argv)
+
+    destination = sys.stdout.buffer if args.path == "-" else args.path
+    try:
+        count = export_history(ConnectionManager.for_path(args.db), destination, args.format,
+                               args.start, args.end, args.location)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Ошибка экспорта: {str(e)}", file=sys.stderr)
+        return 1
+    print(f"{count} rows exported", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+"""
+Client geolocation by IP address
+
+An optional offline IP range database (see ipdb.py) is asked first. Other
+lookups go through GeoCache, a per-IP cache with a bounded in-memory front
+and a table in the app database behind it, so concurrent web clients and
+restarts reuse earlier answers. Failed lookups are cached too, but only
+briefly, so a provider outage is retried soon after.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .database import ConnectionManager, SharedInstances
+from .ipdb import IPDatabase
+
+UNKNOWN_LOCATION = "Неизвестно"
+
+# Offline IP range database built with ipdb.py; used when the file exists
+OFFLINE_DATABASE = os.environ.get("WEIGHTCALC_IP_DATABASE", str(Path.home() / "ip_locations.bin"))
+
+# Seconds a resolved location and a failed lookup stay valid
+POSITIVE_TTL = 7 * 24 * 3600
+NEGATIVE_TTL = 10 * 60
+
+# Seconds before the next provider is asked as well, and for a whole lookup
+HEDGE_DELAY = 0.5
+LOOKUP_DEADLINE = 5.0
+
+# Consecutive failures that open a provider's circuit, and how long it
+# stays open: BREAKER_BASE_DELAY doubled per further failure, capped
+BREAKER_THRESHOLD = 2
+BREAKER_BASE_DELAY = 10.0
+BREAKER_MAX_DELAY = 600.0
+
+# Weight of the newest sample in the moving latency and error averages
+HEALTH_SMOOTHING = 0.3
+
+# Entries kept in memory and in the database table
+MAX_MEMORY_ENTRIES = 1024
+MAX_STORED_ENTRIES = 10000
+
+SERVICES = [
+    {
+        'url': 'https://ipapi.co/{ip}/json/',
+        'own_url': 'https://ipapi.co/json/',
+        'priority': 1,
+        'fields': {'city': 'city', 'region': 'region', 'country': 'country_name'}
+    },
+    {
+        'url': 'https://ipwho.is/{ip}',
+        'own_url': 'https://ipwho.is/',
+        'priority': 2,
+        'fields': {'city': 'city', 'region': 'region', 'country': 'country'}
+    },
+    {
+        'url': 'https://ip-api.com/json/{ip}',
+        'own_url': 'https://ip-api.com/json/',
+        'priority': 3,
+        'fields': {'city': 'city', 'region': 'regionName', 'country': 'country'}
+    }
+]
+
+
+def service_url(service: dict, client_ip: Optional[str]) -> str:
+    """Provider URL for an IP; without one the provider locates the caller"""
+    return service['url'].format(ip=client_ip) if client_ip else service['own_url']
+
+
+def parse_location(data: dict, fields: dict) -> Optional[str]:
+    """
+    Build "City, Region, Country" from a provider response
+
+    Parts that are missing, one character long or numeric are left out.
+
+    Returns:
+        Location string, or None if no part is usable
+    """
+    location_parts = []
+    for key in ('city', 'region', 'country'):
+        value = data.get(fields[key])
+        if isinstance(value, str) and len(value) > 1 and not value.isdigit():
+            location_parts.append(value)
+    return ', '.join(location_parts) if location_parts else None
+
+
+class ProviderHealth:
+    """
+    Circuit breaker and statistics for one geolocation provider
+
+    After BREAKER_THRESHOLD consecutive failures the circuit opens and the
+    provider is skipped without a request. Once the backoff has passed one
+    lookup may probe it again (half-open); a success closes the circuit, a
+    failure reopens it with twice the delay.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.open_until = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self, now: float) -> bool:
+        """Whether a request may be sent now; claims the probe of a half-open circuit"""
+        with self._lock:
+            if self.consecutive_failures < BREAKER_THRESHOLD:
+                return True
+            if now < self.open_until or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record(self, ok: bool, latency: float):
+        with self._lock:
+            self.requests += 1
+            self.probing = False
+            self.error_rate += HEALTH_SMOOTHING * ((0.0 if ok else 1.0) - self.error_rate)
+            if ok:
+                self.consecutive_failures = 0
+                self.latency = latency if self.latency is None else \
+                    self.latency + HEALTH_SMOOTHING * (latency - self.latency)
+                return
+            self.errors += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= BREAKER_THRESHOLD:
+                backoff = BREAKER_BASE_DELAY * 2 ** (self.consecutive_failures - BREAKER_THRESHOLD)
+                self.open_until = time.monotonic() + min(backoff, BREAKER_MAX_DELAY)
+
+    def score(self) -> float:
+        """Expected cost of asking this provider; lower is better"""
+        # Providers never measured are assumed to be as fast as the timeout allows
+        latency = self.latency if self.latency is not None else 1.0
+        return latency * (1 + 4 * self.error_rate)
+
+
+_health = {}
+_health_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+
+def provider_health(service: dict) -> ProviderHealth:
+    """Health record of a provider, keyed by its URL"""
+    with _health_lock:
+        if service['url'] not in _health:
+            _health[service['url']] = ProviderHealth()
+        return _health[service['url']]
+
+
+def provider_stats() -> dict:
+    """
+    Per-provider counters for monitoring
+
+    Returns:
+        Dict of provider URL to requests, errors, mean latency in seconds,
+        error rate, score and whether its circuit is open
+    """
+    now = time.monotonic()
+    with _health_lock:
+        items = list(_health.items())
+    return {url: {'requests': health.requests,
+                  'errors': health.errors,
+                  'latency': health.latency,
+                  'error_rate': round(health.error_rate, 3),
+                  'score': round(health.score(), 3),
+                  'open': health.consecutive_failures >= BREAKER_THRESHOLD and now < health.open_until}
+            for url, health in items}
+
+
+def _http_session():
+    """Keep-alive session shared by all lookups, so repeated requests reuse connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported here so that startup does not pay for the HTTP stack
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            _session = requests.Session()
+            _session.headers.update({
+                'User-Agent': 'Mozilla/5.0',
+                'Accept': 'application/json'
+            })
+            adapter = HTTPAdapter(pool_connections=len(SERVICES), pool_maxsize=16)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def _query(service: dict, client_ip: Optional[str], timeout: float) -> Optional[str]:
+    """Ask one provider; raises on network or HTTP errors"""
+    url = service_url(service, client_ip)
+    response = _http_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    print(f"Ответ от {url}: {data}")
+    return parse_location(data, service['fields'])
+
+
+def lookup_location(client_ip: Optional[str] = None, services=None, hedge_delay: float = HEDGE_DELAY,
+                    deadline: float = LOOKUP_DEADLINE) -> Optional[str]:
+    """
+    Ask the providers with hedged requests
+
+    Providers are tried healthiest first, and those with an open circuit
+    breaker are skipped. The first provider is asked at once and each next
+    one hedge_delay seconds after the previous, or as soon as a provider
+    fails. The first valid answer wins; providers not started yet are never
+    asked and answers still in flight are ignored. Nothing waits past the
+    deadline.
+
+    Args:
+        client_ip: IP address of the client, or None for this machine
+        services: providers in order of preference (defaults to SERVICES)
+        hedge_delay: seconds before the next provider is also asked; 0 asks all at once
+        deadline: seconds for the whole lookup
+
+    Returns:
+        Location string, or None if no provider answered in time
+    """
+    services = SERVICES if services is None else services
+    # Healthiest first; the configured priority breaks ties
+    services = sorted(services, key=lambda service: (provider_health(service).score(),
+                                                     service.get('priority', 0)))
+    print(f"Определение местоположения для IP: {client_ip}")
+    end = time.monotonic() + deadline
+    results = queue.Queue()
+
+    def ask(service, health):
+        location = None
+        started = time.monotonic()
+        try:
+            location = _query(service, client_ip, max(end - started, 0.001))
+            # A reply without a location (e.g. {"success": false} when rate
+            # limited) counts as a failure, so the breaker can open on it
+            health.record(location is not None, time.monotonic() - started)
+        except Exception as e:
+            health.record(False, time.monotonic() - started)
+            print(f"Ошибка сервиса {service_url(service, client_ip)}: {str(e)}")
+        results.put(location)
+
+    launched = running = 0
+    next_launch = time.monotonic()
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            return None
+        if launched < len(services) and now >= next_launch:
+            service = services[launched]
+            launched += 1
+            health = provider_health(service)
+            # An open circuit is skipped without waiting for the hedge delay
+            if health.acquire(now):
+                threading.Thread(target=ask, args=(service, health), name="geolocation", daemon=True).start()
+                running += 1
+                next_launch = now + hedge_delay
+            continue
+        if running == 0:
+            return None
+
+        wait = end - now
+        if launched < len(services):
+            wait = min(wait, next_launch - now)
+        try:
+            location = results.get(timeout=wait)
+        except queue.Empty:
+            continue
+        running -= 1
+        if location:
+            # Requests still in flight finish in the background and are ignored
+            print(f"Определено местоположение: {location}")
+            return location
+        # Do not wait out the hedge delay after a failure
+        next_launch = time.monotonic()
+
+
+class GeoCache(SharedInstances):
+    """
+    Per-IP location cache with expiry, persisted in the app database
+
+    A failed lookup is stored as NULL and expires after NEGATIVE_TTL
+    instead of POSITIVE_TTL. Both the memory front and the table are
+    bounded; the table drops expired entries first, then those closest to
+    expiry.
+    """
+
+    def __init__(self, manager: ConnectionManager, positive_ttl: int = POSITIVE_TTL,
+                 negative_ttl: int = NEGATIVE_TTL, max_memory: int = MAX_MEMORY_ENTRIES,
+                 max_stored: int = MAX_STORED_ENTRIES):
+        self.manager = manager
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_memory = max_memory
+        self.max_stored = max_stored
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        with manager.writer() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS geo_cache
+                            (ip TEXT PRIMARY KEY,
+                             location TEXT,
+                             expires INTEGER NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_geo_cache_expires ON geo_cache (expires)")
+
+    @classmethod
+    def shared(cls, manager: ConnectionManager) -> "GeoCache":
+        """Get the cache shared by all sessions for a database"""
+        return cls._shared(manager.path, lambda: cls(manager))
+
+    def _remember(self, ip: str, location: Optional[str], expires: int):
+        with self._lock:
+            self._memory[ip] = (location, expires)
+            self._memory.move_to_end(ip)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+
+    def get(self, ip: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Look up a cached location
+
+        Returns:
+            Tuple of (hit, location); location is None for a cached failure
+        """
+        ip = ip or ""
+        now = int(time.time())
+        with self._lock:
+            entry = self._memory.get(ip)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(ip)
+                    return True, entry[0]
+                del self._memory[ip]
+
+        try:
+            with self.manager.reader() as conn:
+                row = conn.execute("SELECT location, expires FROM geo_cache WHERE ip = ? AND expires > ?",
+                                   (ip, now)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Ошибка чтения кэша местоположений: {str(e)}")
+            return False, None
+        if row is None:
+            return False, None
+        self._remember(ip, row[0], row[1])
+        return True, row[0]
+
+    def put(self, ip: Optional[str], location: Optional[str]):
+        """Store a lookup result; None records a failure"""
+        ip = ip or ""
+        expires = int(time.time()) + (self.positive_ttl if location else self.negative_ttl)
+        self._remember(ip, location, expires)
+        try:
+            with self.manager.writer() as conn:
+                conn.execute("INSERT OR REPLACE INTO geo_cache (ip, location, expires) VALUES (?, ?, ?)",
+                             (ip, location, expires))
+                excess = conn.execute("SELECT COUNT(*) FROM geo_cache").fetchone()[0] - self.max_stored
+                if excess > 0:
+                    conn.execute("""DELETE FROM geo_cache WHERE ip IN
+                                    (SELECT ip FROM geo_cache ORDER BY expires LIMIT ?)""", (excess,))
+        except sqlite3.Error as e:
+            print(f"Ошибка записи кэша местоположений: {str(e)}")
+
+
+def offline_location(client_ip: Optional[str]) -> Optional[str]:
+    """Location from the offline database, or None if there is no file or no match"""
+    if not client_ip or not os.path.exists(OFFLINE_DATABASE):
+        return None
+    try:
+        return IPDatabase.shared(OFFLINE_DATABASE).lookup(client_ip) or None
+    except (OSError, ValueError) as e:
+        print(f"Ошибка базы IP-адресов: {str(e)}")
+        return None
+
+
+def get_location_fallback(client_ip: Optional[str] = None, cache: Optional[GeoCache] = None) -> str:
+    """
+    Get location based on client IP
+
+    Args:
+        client_ip: IP address of the client, or None for this machine
+        cache: cache to answer from and store the result in
+
+    Returns:
+        "City, Region, Country", or UNKNOWN_LOCATION if it cannot be determined
+    """
+    location = offline_location(client_ip)
+    if location:
+        return location
+
+    if cache is not None:
+        hit, location = cache.get(client_ip)
+        if hit:
+            return location or UNKNOWN_LOCATION
+
+    location = None
+    try:
+        location = lookup_location(client_ip)
+    except Exception as e:
+        print(f"Общая ошибка определения местоположения: {str(e)}")
+    if cache is not None:
+        cache.put(client_ip, location)
+    return location or UNKNOWN_LOCATION
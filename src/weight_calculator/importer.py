@@ -0,0 +1,253 @@
+"""
+Streaming CSV import of calibration points and calculation history
+
+Files are read row by row and inserted with executemany in chunked
+transactions, so memory use does not grow with the file. Every row is
+checked with the rules from utils.py; invalid rows are reported with their
+line number and skipped.
+
+Usage:
+    python -m src.weight_calculator.importer points calibration.csv
+    python -m src.weight_calculator.importer history history.csv --db ~/calibration.db
+"""
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from utils import validate_input, validate_points
+
+from .database import ConnectionManager
+from .locations import HISTORY_INSERT
+
+# Keep only the first errors; the total is still counted
+MAX_REPORTED_ERRORS = 1000
+
+HISTORY_DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%m/%d/%Y")
+
+
+class ImportReport:
+    """Outcome of an import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.calibration_valid: Optional[bool] = None
+        self.calibration_message = ""
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _open_rows(source) -> Tuple[Iterator[Tuple[int, List[str]]], Callable[[], Optional[float]], Callable[[], None]]:
+    """
+    Iterate (line number, fields) of a CSV path or text stream
+
+    Returns:
+        Tuple of (rows, fraction of the file read or None, close)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        raw = open(source, "rb")
+        size = os.path.getsize(source) or 1
+        stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        fraction = lambda: min(raw.tell() / size, 1.0)
+        close = stream.close
+    else:
+        stream = source
+        fraction = lambda: None
+        close = lambda: None
+    reader = csv.reader(stream)
+    return ((reader.line_num, row) for row in reader if row), fraction, close
+
+
+def _is_header(fields: List[str]) -> bool:
+    """A first row is a header when it has no numeric value at all"""
+    for field in fields:
+        try:
+            float(field)
+            return False
+        except ValueError:
+            continue
+    return True
+
+
+def _column_indexes(header: List[str], names: Tuple[str, ...]) -> List[Optional[int]]:
+    lowered = [h.strip().lower() for h in header]
+    return [lowered.index(name) if name in lowered else None for name in names]
+
+
+def _parse_timestamp(value: str) -> int:
+    value = value.strip()
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    for date_format in HISTORY_DATE_FORMATS:
+        try:
+            return int(datetime.strptime(value, date_format).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Некорректная дата: {value}")
+
+
+def _import(manager: ConnectionManager, source, columns: Tuple[str, ...], parse_row, insert_sql: str,
+            chunk_size: int, progress, report: ImportReport, prepare=None):
+    rows, fraction, close = _open_rows(source)
+
+    def insert(chunk):
+        with manager.writer() as conn:
+            if prepare:
+                prepare(conn, chunk)
+            conn.executemany(insert_sql, chunk)
+        report.imported += len(chunk)
+
+    try:
+        indexes = list(range(len(columns)))
+        first = True
+        chunk = []
+        for line, fields in rows:
+            if first:
+                first = False
+                if _is_header(fields):
+                    indexes = _column_indexes(fields, columns)
+                    continue
+            report.rows += 1
+            try:
+                values = [fields[i].strip() if i is not None and i < len(fields) else "" for i in indexes]
+                chunk.append(parse_row(values))
+            except ValueError as e:
+                report.add_error(line, str(e))
+
+            if len(chunk) >= chunk_size:
+                insert(chunk)
+                chunk = []
+                if progress:
+                    progress(report, fraction())
+        if chunk:
+            insert(chunk)
+        if progress:
+            progress(report, 1.0)
+    finally:
+        close()
+
+
+def import_points(manager: ConnectionManager, source, chunk_size: int = 1000,
+                  progress: Callable[[ImportReport, Optional[float]], None] = None) -> ImportReport:
+    """
+    Import (pressure, weight) calibration points from CSV
+
+    A header row is optional; with one, the columns named pressure and
+    weight are used. Pressures already present, in the database or earlier
+    in the file, are rejected like validate_points does.
+
+    Args:
+        manager: connection manager of the target database
+        source: path or text stream of the CSV file
+        chunk_size: rows per transaction
+        progress: called after every chunk with the report and the fraction of the file read
+
+    Returns:
+        ImportReport with per-row errors and whether the resulting calibration is valid
+    """
+    report = ImportReport()
+    with manager.reader() as conn:
+        # Holds one float per point, which is what the uniqueness rule needs
+        seen = {row[0] for row in conn.execute("SELECT pressure FROM calibration_points")}
+
+    def parse_row(values):
+        pressure, weight = values
+        is_valid, message = validate_input(pressure, weight)
+        if not is_valid:
+            raise ValueError(message)
+        point = (float(pressure), float(weight))
+        if point[0] in seen:
+            # Same rule as validate_points, checked per row to report the line
+            raise ValueError(validate_points([point, point])[1])
+        seen.add(point[0])
+        return point
+
+    _import(manager, source, ("pressure", "weight"), parse_row,
+            "INSERT INTO calibration_points (pressure, weight) VALUES (?, ?)",
+            chunk_size, progress, report)
+
+    with manager.reader() as conn:
+        points = conn.execute("SELECT pressure, weight FROM calibration_points").fetchall()
+    report.calibration_valid, report.calibration_message = validate_points(points)
+    return report
+
+
+def import_history(manager: ConnectionManager, source, chunk_size: int = 1000,
+                   progress: Callable[[ImportReport, Optional[float]], None] = None) -> ImportReport:
+    """
+    Import calculation history rows (date, pressure, weight, location) from CSV
+
+    Dates may be epoch seconds or one of HISTORY_DATE_FORMATS in local time;
+    location is optional.
+
+    Args:
+        manager: connection manager of the target database
+        source: path or text stream of the CSV file
+        chunk_size: rows per transaction
+        progress: called after every chunk with the report and the fraction of the file read
+
+    Returns:
+        ImportReport with per-row errors
+    """
+    report = ImportReport()
+
+    def parse_row(values):
+        date, pressure, weight, location = values
+        is_valid, message = validate_input(pressure, weight)
+        if not is_valid:
+            raise ValueError(message)
+        return _parse_timestamp(date), float(pressure), float(weight), location or None
+
+    def intern_locations(conn, chunk):
+        names = {(row[3],) for row in chunk if row[3]}
+        conn.executemany("INSERT OR IGNORE INTO locations (name) VALUES (?)", names)
+
+    _import(manager, source, ("date", "pressure", "weight", "location"), parse_row,
+            HISTORY_INSERT, chunk_size, progress, report, intern_locations)
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import calibration points or history from CSV")
+    parser.add_argument("kind", choices=("points", "history"))
+    parser.add_argument("path", help="CSV file")
+    parser.add_argument("--db", default=str(Path.home() / "calibration.db"), help="database file")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    def show_progress(report, fraction):
+        done = f"{fraction:6.1%}" if fraction is not None else ""
+        print(f"\r{done} {report.imported} imported, {report.error_count} errors", end="", file=sys.stderr)
+
+    importer = import_points if args.kind == "points" else import_history
+    try:
+        report = importer(ConnectionManager.for_path(args.db), args.path, args.chunk_size, show_progress)
+    except sqlite3.Error as e:
+        print(f"\nОшибка импорта: {str(e)}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+
+    for line, message in report.errors:
+        print(f"line {line}: {message}")
+    if report.error_count > len(report.errors):
+        print(f"... {report.error_count - len(report.errors)} more errors")
+    if report.calibration_valid is False:
+        print(report.calibration_message)
+    return 0 if report.error_count == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
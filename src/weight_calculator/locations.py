@@ -0,0 +1,90 @@
+"""
+Interned location names for the calculation history
+
+Each distinct "City, Region, Country" string is stored once in locations
+and history rows refer to it by integer id. Rows written before location_id
+existed keep their text in weight_history.location until they are
+migrated, so queries read the name through LOCATION_NAME.
+"""
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from .database import ConnectionManager, SharedInstances
+
+LOCATIONS_SCHEMA = """CREATE TABLE IF NOT EXISTS locations
+                      (id INTEGER PRIMARY KEY,
+                       name TEXT NOT NULL UNIQUE)"""
+
+# Join and name expression for queries over weight_history aliased as h
+LOCATION_JOIN = "LEFT JOIN locations l ON l.id = h.location_id"
+LOCATION_NAME = "COALESCE(l.name, h.location)"
+
+# Insert taking the location by name; the name must already be interned
+HISTORY_INSERT = """INSERT INTO weight_history (date, ts, pressure, weight, location_id)
+                    VALUES ('', ?, ?, ?, (SELECT id FROM locations WHERE name = ?))"""
+
+# Both statements take the chunk size; see migrate_in_chunks
+MIGRATE_LOCATIONS = (
+    """INSERT OR IGNORE INTO locations (name)
+       SELECT location FROM weight_history
+       WHERE location IS NOT NULL ORDER BY id DESC LIMIT ?""",
+    """UPDATE weight_history
+       SET location_id = (SELECT id FROM locations WHERE name = weight_history.location),
+           location = NULL
+       WHERE id IN (SELECT id FROM weight_history
+                    WHERE location IS NOT NULL ORDER BY id DESC LIMIT ?)""",
+)
+
+
+def create_locations_table(conn: sqlite3.Connection):
+    """Create the locations table if it does not exist"""
+    conn.execute(LOCATIONS_SCHEMA)
+
+
+def intern_location(conn: sqlite3.Connection, name: Optional[str]) -> Optional[int]:
+    """
+    Get the id of a location name, adding it if it is new
+
+    Args:
+        conn: writable connection
+        name: location name, or None
+
+    Returns:
+        Location id, or None for no location
+    """
+    if not name:
+        return None
+    conn.execute("INSERT OR IGNORE INTO locations (name) VALUES (?)", (name,))
+    return conn.execute("SELECT id FROM locations WHERE name = ?", (name,)).fetchone()[0]
+
+
+class LocationCache(SharedInstances):
+    """
+    Location ids already interned in one database
+
+    Names are never removed from locations, so a cached id stays valid
+    and interning a known name costs no database access.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, path: str) -> "LocationCache":
+        """Get the cache shared by all sessions for a database file"""
+        return cls._shared(path, cls)
+
+    def intern(self, manager: ConnectionManager, name: Optional[str]) -> Optional[int]:
+        """Same as intern_location; only takes the writer for names not seen before"""
+        if not name:
+            return None
+        with self._lock:
+            location_id = self._ids.get(name)
+        if location_id is None:
+            with manager.writer() as conn:
+                location_id = intern_location(conn, name)
+            with self._lock:
+                self._ids[name] = location_id
+        return location_id
@@ -0,0 +1,154 @@
+"""
+Hedged provider queries of lookup_location against local stub HTTP servers,
+and the per-provider circuit breaker
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.weight_calculator import geolocation
+
+FIELDS = {'city': 'city', 'region': 'region', 'country': 'country'}
+
+
+def start_stub(delay=0.0, status=200, city="Bishkek"):
+    """Stub provider answering every request after delay seconds"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.server.hits += 1
+            time.sleep(delay)
+            body = json.dumps({'city': city, 'region': 'Chuy', 'country': 'Kyrgyzstan'}).encode()
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except OSError:
+                pass  # the lookup gave up on this request
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def service(server, priority):
+    url = f"http://127.0.0.1:{server.server_port}/"
+    return {'url': url + '{ip}', 'own_url': url, 'priority': priority, 'fields': FIELDS}
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    """Start stub providers with fresh health records; shut down after the test"""
+    monkeypatch.setattr(geolocation, '_health', {})
+    servers = []
+
+    def start(**kwargs):
+        server = start_stub(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+# Stub delays are far apart from the hedge delays and deadlines, so the
+# checks below only compare against them and tolerate a slow machine
+
+def test_slow_primary_loses_to_hedge(stubs):
+    primary_delay = 2.0
+    primary = stubs(delay=primary_delay, city="Slow")
+    secondary = stubs(city="Fast")
+
+    started = time.monotonic()
+    location = geolocation.lookup_location('8.8.8.8', [service(primary, 1), service(secondary, 2)],
+                                           hedge_delay=0.2, deadline=5.0)
+
+    assert location == "Fast, Chuy, Kyrgyzstan"
+    # Answered by the hedge, not by waiting for the primary
+    assert time.monotonic() - started < primary_delay
+    assert primary.hits == 1 and secondary.hits == 1
+
+
+def test_failing_primary_hands_over_at_once(stubs):
+    primary = stubs(status=500)
+    secondary = stubs(city="Backup")
+
+    deadline = 5.0
+    started = time.monotonic()
+    # The hedge delay alone would keep the secondary waiting past the deadline,
+    # so getting its answer at all shows it was asked as soon as the primary failed
+    location = geolocation.lookup_location('8.8.8.8', [service(primary, 1), service(secondary, 2)],
+                                           hedge_delay=10.0, deadline=deadline)
+
+    assert location == "Backup, Chuy, Kyrgyzstan"
+    assert time.monotonic() - started < deadline
+    assert primary.hits == 1 and secondary.hits == 1
+
+
+def test_lookup_stops_at_deadline(stubs):
+    stub_delay = 3.0
+    primary = stubs(delay=stub_delay)
+    secondary = stubs(delay=stub_delay)
+
+    started = time.monotonic()
+    location = geolocation.lookup_location('8.8.8.8', [service(primary, 1), service(secondary, 2)],
+                                           hedge_delay=0.1, deadline=0.5)
+
+    assert location is None
+    # Gave up at the deadline instead of waiting for either stub
+    assert time.monotonic() - started < stub_delay
+
+
+def test_breaker_opens_after_consecutive_failures():
+    health = geolocation.ProviderHealth()
+    for _ in range(geolocation.BREAKER_THRESHOLD - 1):
+        health.record(False, 0.1)
+        assert health.acquire(time.monotonic())
+
+    health.record(False, 0.1)
+    assert not health.acquire(time.monotonic())
+    assert health.open_until - time.monotonic() <= geolocation.BREAKER_BASE_DELAY
+
+
+def test_breaker_half_opens_for_one_probe():
+    health = geolocation.ProviderHealth()
+    for _ in range(geolocation.BREAKER_THRESHOLD):
+        health.record(False, 0.1)
+    after_backoff = health.open_until + 0.01
+
+    assert health.acquire(after_backoff)
+    # Only one lookup may probe while the first probe is out
+    assert not health.acquire(after_backoff)
+
+    first_open_until = health.open_until
+    started = time.monotonic()
+    health.record(False, 0.1)
+    # A failed probe reopens the circuit with twice the delay
+    assert health.open_until - started >= 2 * geolocation.BREAKER_BASE_DELAY - 0.01
+    assert health.open_until > first_open_until
+    assert not health.acquire(after_backoff)
+
+
+def test_successful_probe_closes_breaker():
+    health = geolocation.ProviderHealth()
+    for _ in range(geolocation.BREAKER_THRESHOLD):
+        health.record(False, 0.1)
+
+    assert health.acquire(health.open_until + 0.01)
+    health.record(True, 0.1)
+
+    assert health.consecutive_failures == 0
+    assert health.acquire(time.monotonic())
+    assert health.acquire(time.monotonic())
@@ -0,0 +1,69 @@
+"""
+Calibration curve evaluation: the built-in quadratic spline against SciPy
+and the array evaluators on scalar and iterator input
+"""
+import pytest
+
+from src.weight_calculator.interpolation import CalibrationLUT, CalibrationModel, IncrementalPolyFit
+
+POINTS = [(10.0, 1.0), (20.0, 2.5), (35.0, 3.1), (50.0, 6.0), (80.0, 7.2)]
+
+# Recorded from interp1d(kind='quadratic', fill_value='extrapolate') over POINTS:
+# extrapolation on both sides, the data points, the spline knots 27.5 and
+# 42.5, and values between them
+SCIPY_VALUES = [
+    (-5.0, -3.7658582089552235),
+    (0.0, -1.8417910447761199),
+    (10.0, 1.0),
+    (15.0, 1.9177238805970154),
+    (20.0, 2.4999999999999996),
+    (27.5, 2.7444496268656717),
+    (35.0, 3.0999999999999996),
+    (42.5, 4.432509328358209),
+    (50.0, 5.999999999999999),
+    (65.0, 7.613992537313434),
+    (80.0, 7.2),
+    (95.0, 4.758022388059706),
+    (120.0, -3.8185737976782654),
+]
+
+
+@pytest.mark.parametrize("pressure, weight", SCIPY_VALUES)
+def test_quadratic_spline_matches_recorded_scipy_values(pressure, weight):
+    assert CalibrationModel(POINTS)(pressure) == pytest.approx(weight, rel=1e-12, abs=1e-12)
+
+
+def test_quadratic_spline_evaluate_matches_scalar_calls():
+    model = CalibrationModel(POINTS)
+    pressures = [p for p, _ in SCIPY_VALUES]
+    values = model.evaluate(pressures)
+    assert [float(v) for v in values] == pytest.approx([model(p) for p in pressures], rel=1e-12)
+
+
+def test_quadratic_spline_matches_live_scipy():
+    interpolate = pytest.importorskip("scipy.interpolate")
+    np = pytest.importorskip("numpy")
+
+    points = [(0.5, 0.0), (1.7, 3.2), (2.0, 4.1), (4.4, 4.0), (7.1, 9.5), (9.0, 9.9), (12.5, 15.0)]
+    x, y = zip(*points)
+    reference = interpolate.interp1d(x, y, kind='quadratic', fill_value='extrapolate')
+    pressures = np.linspace(-3.0, 16.0, 400)
+
+    np.testing.assert_allclose(CalibrationModel(points).evaluate(pressures), reference(pressures),
+                               rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize("make", [
+    lambda: CalibrationModel(POINTS),
+    lambda: CalibrationLUT.build(CalibrationModel(POINTS)),
+    lambda: IncrementalPolyFit(POINTS),
+], ids=["model", "lut", "incremental"])
+def test_evaluate_accepts_scalars(make):
+    np = pytest.importorskip("numpy")
+    evaluator = make()
+
+    for pressure in (42.5, np.float64(42.5), np.array(42.5)):
+        value = evaluator.evaluate(pressure)
+        assert np.ndim(value) == 0
+        assert float(value) == pytest.approx(evaluator(42.5))
+    assert list(evaluator.evaluate(iter([15.0, 65.0]))) == pytest.approx([evaluator(15.0), evaluator(65.0)])
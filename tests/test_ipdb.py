@@ -0,0 +1,79 @@
+"""
+Offline IP range database: build from CSV, memory-map and look up
+"""
+import ipaddress
+import random
+
+import pytest
+
+from src.weight_calculator.ipdb import IPDatabase, build_ip_database
+
+CSV = """start,end,location
+10.0.0.0/8,,Private
+1.0.0.0,1.0.0.255,"Bishkek, Chuy, Kyrgyzstan"
+1.0.2.0,1.0.3.255,Osh
+8.8.8.0/24,,Mountain View
+255.255.255.0,255.255.255.255,Last
+0.0.0.0,0.0.0.255,First
+"""
+
+RANGES = [
+    ("0.0.0.0", "0.0.0.255", "First"),
+    ("1.0.0.0", "1.0.0.255", "Bishkek, Chuy, Kyrgyzstan"),
+    ("1.0.2.0", "1.0.3.255", "Osh"),
+    ("8.8.8.0", "8.8.8.255", "Mountain View"),
+    ("10.0.0.0", "10.255.255.255", "Private"),
+    ("255.255.255.0", "255.255.255.255", "Last"),
+]
+
+
+def reference_lookup(ip):
+    value = int(ipaddress.IPv4Address(ip))
+    for start, end, name in RANGES:
+        if int(ipaddress.IPv4Address(start)) <= value <= int(ipaddress.IPv4Address(end)):
+            return name
+    return None
+
+
+@pytest.fixture
+def database(tmp_path):
+    source = tmp_path / "ranges.csv"
+    source.write_text(CSV, encoding="utf-8")
+    path = tmp_path / "ip_locations.bin"
+    assert build_ip_database(str(source), str(path)) == len(RANGES)
+    return IPDatabase(str(path))
+
+
+def test_range_edges(database):
+    assert len(database) == len(RANGES)
+    for start, end, name in RANGES:
+        assert database.lookup(start) == name
+        assert database.lookup(end) == name
+
+
+@pytest.mark.parametrize("ip", ["0.0.1.0", "1.0.1.0", "1.0.1.255", "1.0.4.0", "8.8.7.255", "8.8.9.0",
+                                "11.0.0.0", "255.255.254.255"])
+def test_addresses_between_ranges(database, ip):
+    assert database.lookup(ip) is None
+
+
+@pytest.mark.parametrize("ip", ["", "::1", "1.2.3", "300.1.1.1", None])
+def test_invalid_addresses(database, ip):
+    assert database.lookup(ip) is None
+
+
+def test_matches_reference_lookup(database):
+    generator = random.Random(0)
+    edges = [int(ipaddress.IPv4Address(ip)) for start, end, _ in RANGES for ip in (start, end)]
+    values = [generator.getrandbits(32) for _ in range(2000)]
+    values += [min(max(edge + delta, 0), 2 ** 32 - 1) for edge in edges for delta in (-1, 0, 1)]
+    for value in values:
+        ip = str(ipaddress.IPv4Address(value))
+        assert database.lookup(ip) == reference_lookup(ip), ip
+
+
+def test_overlapping_ranges_are_rejected(tmp_path):
+    source = tmp_path / "ranges.csv"
+    source.write_text("1.0.0.0/24,,A\n1.0.0.128,1.0.1.0,B\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Overlapping"):
+        build_ip_database(str(source), str(tmp_path / "ip_locations.bin"))